@@ -1,61 +1,29 @@
-import time
 import tkinter as tk
 from tkinter import ttk, messagebox
-from screeninfo import get_monitors
-import pygetwindow as gw
 import json
 import os
-import subprocess
 import shutil
 
-SAVE_FILE = "saved_chrome_links.json"
-
-
-def get_monitors_with_names():
-    monitors = get_monitors()
-    monitor_labels = []
-    for i, m in enumerate(monitors):
-        label = f"Monitor {i + 1} ({m.width}x{m.height} @ {m.x},{m.y})"
-        monitor_labels.append((i, label))
-    return monitor_labels, monitors
-
-
-def get_window_titles():
-    return [w for w in gw.getAllWindows() if w.title.strip() and w.visible]
-
-
-def rect_intersection_area(r1, r2):
-    x1 = max(r1[0], r2[0])
-    y1 = max(r1[1], r2[1])
-    x2 = min(r1[0] + r1[2], r2[0] + r2[2])
-    y2 = min(r1[1] + r1[3], r2[1] + r2[3])
-
-    width = max(0, x2 - x1)
-    height = max(0, y2 - y1)
-    return width * height
-
-
-def find_monitor_for_window(window, monitors):
-    wx, wy, ww, wh = window.left, window.top, window.width, window.height
-    window_rect = (wx, wy, ww, wh)
-    max_area = 0
-    best_monitor_index = None
+from monitor_topology import MonitorTopology
+from window_list import TreeSync, WindowCache, WindowFilter
+from window_restore import DEFAULT_LAUNCH_MODE, LAUNCH_MODES, LEGACY_LAUNCH_MODE, RestoreEngine, RestoreJob, place_window
+from window_tasks import WindowTask, WindowTaskQueue
 
-    for i, m in enumerate(monitors):
-        monitor_rect = (m.x, m.y, m.width, m.height)
-        area = rect_intersection_area(window_rect, monitor_rect)
-        if area > max_area:
-            max_area = area
-            best_monitor_index = i
-
-    return best_monitor_index
+SAVE_FILE = "saved_chrome_links.json"
+# Filtr okien jest stosowany dopiero po tylu milisekundach bez kolejnego naciśnięcia klawisza
+FILTER_DEBOUNCE_MS = 150
+# Co tyle milisekund lista w oknie sprawdza, czy odczyt okien w tle przyniósł zmiany
+WINDOW_POLL_MS = 250
+# Osobny profil Chrome dla przywracanych linków (--user-data-dir); domyślnie brak – okna otwierają się
+# w zwykłym profilu użytkownika, z jego zalogowanymi sesjami i ciasteczkami
+CHROME_PROFILE_DIR = os.getenv("DISPLAY_MANAGER_CHROME_PROFILE") or None
 
 
 class AddLinkDialog(tk.Toplevel):
     def __init__(self, parent, monitor_labels):
         super().__init__(parent)
         self.title("Dodaj link Chrome")
-        self.geometry("400x150")
+        self.geometry("400x200")
         self.resizable(False, False)
         self.transient(parent)
         self.grab_set()
@@ -76,6 +44,12 @@ class AddLinkDialog(tk.Toplevel):
             self.monitor_combobox.current(0)
         self.monitor_combobox.pack(pady=(0, 10))
 
+        tk.Label(self, text="Tryb okna:").pack()
+        self.mode_keys = list(LAUNCH_MODES)
+        self.mode_combobox = ttk.Combobox(self, values=list(LAUNCH_MODES.values()), state="readonly")
+        self.mode_combobox.current(self.mode_keys.index(DEFAULT_LAUNCH_MODE))
+        self.mode_combobox.pack(pady=(0, 10))
+
         button_frame = tk.Frame(self)
         button_frame.pack()
 
@@ -97,7 +71,7 @@ class AddLinkDialog(tk.Toplevel):
         if monitor == -1:
             messagebox.showwarning("Uwaga", "Wybierz monitor.")
             return
-        self.result = (url, monitor)
+        self.result = (url, monitor, self.mode_keys[self.mode_combobox.current()])
         self.destroy()
 
     def on_cancel(self):
@@ -130,7 +104,10 @@ class DisplayManagerApp(tk.Tk):
         self.rowconfigure(6, weight=1)
 
         tk.Label(self, text="Wybierz monitor:").grid(row=0, column=0, sticky="w", padx=10, pady=(10, 0))
-        self.monitor_labels, self.monitors = get_monitors_with_names()
+        self.topology = MonitorTopology()
+        self.layout = self.topology.layout
+        self.monitors = self.layout.monitors
+        self.monitor_labels = list(enumerate(self.layout.labels))
         self.monitor_combobox = ttk.Combobox(
             self, values=[label for _, label in self.monitor_labels], state="readonly"
         )
@@ -141,9 +118,10 @@ class DisplayManagerApp(tk.Tk):
         tk.Label(self, text="Filtruj okna:").grid(row=2, column=0, sticky="w", padx=10, pady=(10, 0))
         self.filter_entry = tk.Entry(self)
         self.filter_entry.grid(row=3, column=0, sticky="ew", padx=10, pady=(0, 5))
-        self.filter_entry.bind("<KeyRelease>", lambda e: self.update_window_list())
+        self.filter_entry.bind("<KeyRelease>", lambda e: self.schedule_filter())
 
-        self.tree = ttk.Treeview(self, columns=("window", "monitor"), show="headings", selectmode="browse")
+        self.tree = ttk.Treeview(self, columns=("window", "monitor"), show="headings", selectmode="extended")
+        self.tree_sync = TreeSync(self.tree)
         self.tree.heading("window", text="Okno")
         self.tree.heading("monitor", text="Monitor")
         self.tree.column("window", anchor="w", width=400)
@@ -188,40 +166,105 @@ class DisplayManagerApp(tk.Tk):
         delete_link_button = tk.Button(btn_frame, text="Usuń zaznaczony link", command=self.delete_selected_link)
         delete_link_button.grid(row=0, column=2, sticky="ew", padx=(5, 0))
 
-        self.windows_list = []
-        self.filtered_windows_list = []
+        status_frame = tk.Frame(self)
+        status_frame.grid(row=7, column=0, sticky="ew", padx=10, pady=(0, 10))
+        status_frame.columnconfigure(1, weight=1)
+
+        self.task_progress = ttk.Progressbar(status_frame, length=150, mode="determinate")
+        self.task_progress.grid(row=0, column=0, padx=(0, 5))
+        self.task_status = tk.Label(status_frame, text="", anchor="w")
+        self.task_status.grid(row=0, column=1, sticky="ew")
+        self.cancel_button = tk.Button(status_frame, text="Anuluj", command=self.cancel_tasks, state="disabled")
+        self.cancel_button.grid(row=0, column=2, padx=(5, 0))
+
+        self.window_cache = WindowCache(self.topology)
+        self.window_filter = WindowFilter()
+        self.filtered_windows = {}
+        self.shown_version = None
+        self.filter_job = None
         self.entries = []
+        self.tasks = WindowTaskQueue(self, on_change=self.show_task_status)
+        self.restore_task = None
 
         self.load_entries()
+        self.sync_entries_with_layout()
         self.update_saved_links_list()
         self.update_window_list()
+        self.topology.start()
+        self.window_cache.start()
+        self.after(WINDOW_POLL_MS, self.poll_windows)
+
+    def schedule_filter(self):
+        if self.filter_job is not None:
+            self.after_cancel(self.filter_job)
+        self.filter_job = self.after(FILTER_DEBOUNCE_MS, self.show_windows)
+
+    def apply_layout(self, layout):
+        # Wybrany monitor zostaje wybrany także wtedy, gdy po zmianie układu ma inny numer
+        current = self.monitor_combobox.current()
+        selected_id = self.layout.ids[current] if 0 <= current < len(self.layout.ids) else None
+
+        self.layout = layout
+        self.monitors = layout.monitors
+        self.monitor_labels = list(enumerate(layout.labels))
+        self.monitor_combobox.configure(values=layout.labels)
+        if selected_id in layout.index_by_id:
+            self.monitor_combobox.current(layout.index_by_id[selected_id])
+        elif layout.labels:
+            self.monitor_combobox.current(0)
+        else:
+            self.monitor_combobox.set("")
 
-    def filter_windows(self, filter_text, windows):
-        if not filter_text:
-            return windows
-        filter_text = filter_text.lower()
-        return [w for w in windows if filter_text in w.title.lower()]
-
-    def update_window_list(self, selected_hwnd=None):
-        filter_text = self.filter_entry.get().strip()
-        self.windows_list = get_window_titles()
-        self.filtered_windows_list = self.filter_windows(filter_text, self.windows_list)
-
-        self.tree.delete(*self.tree.get_children())
-
-        selected_index = None
-        for idx, w in enumerate(self.filtered_windows_list):
-            monitor_idx = find_monitor_for_window(w, self.monitors)
-            monitor_label = self.monitor_labels[monitor_idx][1] if monitor_idx is not None else "Nieznany monitor"
-
-            self.tree.insert("", "end", iid=str(idx), values=(w.title, monitor_label))
+        self.sync_entries_with_layout()
+        self.update_saved_links_list()
+        self.show_windows()
+
+    def poll_windows(self):
+        if self.topology.layout.version != self.layout.version:
+            self.apply_layout(self.topology.layout)
+        version, _ = self.window_cache.snapshot()
+        if version != self.shown_version:
+            self.show_windows()
+        self.after(WINDOW_POLL_MS, self.poll_windows)
+
+    def show_windows(self):
+        self.filter_job = None
+        version, windows = self.window_cache.snapshot()
+        matches = self.window_filter.apply(version, windows, self.filter_entry.get())
+        self.filtered_windows = {str(info.hwnd): info for info in matches}
+        self.shown_version = version
+
+        rows = []
+        for info in matches:
+            rows.append((str(info.hwnd), (info.title, self.layout.label(info.monitor))))
+        self.tree_sync.update(rows)
+
+    def update_window_list(self, selected_hwnds=()):
+        # Odświeżenie na żądanie (przycisk, po przeniesieniu lub zamknięciu okna) – bez czekania na wątek w tle
+        self.window_cache.refresh()
+        self.show_windows()
+
+        selected = [str(hwnd) for hwnd in selected_hwnds if str(hwnd) in self.filtered_windows]
+        if selected:
+            self.tree.selection_set(selected)
+            self.tree.see(selected[0])
+
+    def show_task_status(self, task):
+        active = self.tasks.active()
+        if not active:
+            self.task_progress["value"] = 0
+            self.task_status.configure(text="")
+            self.cancel_button.configure(state="disabled")
+            return
 
-            if selected_hwnd is not None and w._hWnd == selected_hwnd:
-                selected_index = idx
+        current = active[0]
+        waiting = f" (w kolejce: {len(active) - 1})" if len(active) > 1 else ""
+        self.task_progress.configure(maximum=max(current.total, 1), value=current.done)
+        self.task_status.configure(text=f"{current.label}: {current.done}/{current.total} {current.message}{waiting}")
+        self.cancel_button.configure(state="normal")
 
-        if selected_index is not None:
-            self.tree.selection_set(str(selected_index))
-            self.tree.see(str(selected_index))
+    def cancel_tasks(self):
+        self.tasks.cancel_all()
 
     def move_window_to_monitor(self):
         selected = self.tree.selection()
@@ -234,30 +277,25 @@ class DisplayManagerApp(tk.Tk):
             messagebox.showwarning("Uwaga", "Wybierz monitor.")
             return
 
-        selected_index = int(selected[0])
-        selected_window = self.filtered_windows_list[selected_index]
+        windows = [self.filtered_windows[iid] for iid in selected if iid in self.filtered_windows]
         selected_monitor = self.monitors[monitor_index]
-        selected_hwnd = selected_window._hWnd
 
-        try:
-            selected_window.restore()
-            time.sleep(0.2)
-
-            selected_window.moveTo(selected_monitor.x - 10, selected_monitor.y)
-            time.sleep(0.2)
-
-            selected_window.moveTo(selected_monitor.x, selected_monitor.y)
-            time.sleep(0.2)
-
-            selected_window.resizeTo(selected_monitor.width, selected_monitor.height)
-            time.sleep(0.2)
-
-            selected_window.activate()
+        def work(task):
+            for info in windows:
+                if task.cancelled.is_set():
+                    break
+                try:
+                    place_window(info.window, selected_monitor)
+                    task.advance(info.title)
+                except Exception as e:
+                    task.advance(info.title, f"{info.title}: {e}")
 
-            self.update_window_list(selected_hwnd)
+        def done(task):
+            self.update_window_list([info.hwnd for info in windows])
+            if task.errors:
+                messagebox.showerror("Błąd", "Nie udało się przesunąć okna:\n" + "\n".join(task.errors))
 
-        except Exception as e:
-            messagebox.showerror("Błąd", f"Nie udało się przesunąć okna:\n{e}")
+        self.tasks.submit(WindowTask("Przenoszenie okien", len(windows), work, on_done=done))
 
     def close_window(self):
         selected = self.tree.selection()
@@ -266,22 +304,40 @@ class DisplayManagerApp(tk.Tk):
             messagebox.showwarning("Uwaga", "Wybierz okno do zamknięcia.")
             return
 
-        selected_index = int(selected[0])
-        selected_window = self.filtered_windows_list[selected_index]
+        windows = [self.filtered_windows[iid] for iid in selected if iid in self.filtered_windows]
 
-        try:
-            selected_window.close()
-            messagebox.showinfo("Sukces", f"Okno '{selected_window.title}' zostało zamknięte.")
+        def work(task):
+            for info in windows:
+                if task.cancelled.is_set():
+                    break
+                try:
+                    info.window.close()
+                    task.advance(info.title)
+                except Exception as e:
+                    task.advance(info.title, f"{info.title}: {e}")
+
+        def done(task):
             self.update_window_list()
-        except Exception as e:
-            messagebox.showerror("Błąd", f"Nie udało się zamknąć okno:\n{e}")
+            if task.errors:
+                messagebox.showerror("Błąd", "Nie udało się zamknąć okna:\n" + "\n".join(task.errors))
+            elif task.done == 1:
+                messagebox.showinfo("Sukces", f"Okno '{windows[0].title}' zostało zamknięte.")
+            elif task.done:
+                messagebox.showinfo("Sukces", f"Zamknięto okna: {task.done}.")
+
+        self.tasks.submit(WindowTask("Zamykanie okien", len(windows), work, on_done=done))
 
     def save_chrome_window(self):
         dialog = AddLinkDialog(self, self.monitor_labels)
         self.wait_window(dialog)
         if dialog.result:
-            url, monitor_index = dialog.result
-            self.entries.append({"url": url, "monitor_index": monitor_index})
+            url, monitor_index, mode = dialog.result
+            self.entries.append({
+                "url": url,
+                "monitor_index": monitor_index,
+                "monitor_id": self.layout.ids[monitor_index],
+                "mode": mode,
+            })
             self.save_entries()
             self.update_saved_links_list()
             messagebox.showinfo("Sukces", f"Zapisano link {url} na {self.monitor_labels[monitor_index][1]}")
@@ -289,8 +345,9 @@ class DisplayManagerApp(tk.Tk):
     def update_saved_links_list(self):
         self.saved_links_listbox.delete(0, tk.END)
         for entry in self.entries:
-            monitor_label = self.monitor_labels[entry["monitor_index"]][1] if 0 <= entry["monitor_index"] < len(self.monitor_labels) else "Nieznany monitor"
-            self.saved_links_listbox.insert(tk.END, f'{entry["url"]} [{monitor_label}]')
+            monitor_label = self.layout.label(entry.get("monitor_id"))
+            mode_label = LAUNCH_MODES.get(entry.get("mode", LEGACY_LAUNCH_MODE), "")
+            self.saved_links_listbox.insert(tk.END, f'{entry["url"]} [{monitor_label}, {mode_label}]')
 
     def delete_selected_link(self):
         selection = self.saved_links_listbox.curselection()
@@ -302,6 +359,24 @@ class DisplayManagerApp(tk.Tk):
         self.save_entries()
         self.update_saved_links_list()
 
+    def sync_entries_with_layout(self):
+        # Link jest przypisany do monitora po stabilnym identyfikatorze; monitor_index tylko nadąża za bieżącą kolejnością.
+        # Stare wpisy bez identyfikatora dostają go na podstawie monitor_index przy pierwszym wczytaniu.
+        changed = False
+        for entry in self.entries:
+            monitor_id = entry.get("monitor_id")
+            if monitor_id is None:
+                index = entry.get("monitor_index", -1)
+                if not (0 <= index < len(self.layout.ids)):
+                    continue
+                entry["monitor_id"] = self.layout.ids[index]
+                changed = True
+            elif monitor_id in self.layout.index_by_id and entry.get("monitor_index") != self.layout.index_by_id[monitor_id]:
+                entry["monitor_index"] = self.layout.index_by_id[monitor_id]
+                changed = True
+        if changed:
+            self.save_entries()
+
     def save_entries(self):
         try:
             with open(SAVE_FILE, "w", encoding="utf-8") as f:
@@ -319,40 +394,43 @@ class DisplayManagerApp(tk.Tk):
                 self.entries = []
 
     def restore_saved_links(self):
+        if self.restore_task is not None and not self.restore_task.finished:
+            messagebox.showwarning("Uwaga", "Przywracanie linków już trwa.")
+            return
+
         chrome_path = find_chrome_executable()
         if not chrome_path:
             messagebox.showerror("Błąd", "Nie znaleziono pliku chrome.exe. Upewnij się, że Chrome jest zainstalowany.")
             return
 
-        for entry in self.entries:
+        jobs = []
+        for index, entry in enumerate(self.entries):
             url = entry["url"]
-            monitor_index = entry["monitor_index"]
+            monitor = self.layout.monitor(entry.get("monitor_id"))
 
-            if not (0 <= monitor_index < len(self.monitors)):
-                messagebox.showwarning("Uwaga", f"Niepoprawny monitor dla linku {url}, pomijam.")
+            if monitor is None:
+                messagebox.showwarning("Uwaga", f"Monitor dla linku {url} nie jest podłączony, pomijam.")
                 continue
 
-            monitor = self.monitors[monitor_index]
-
-            try:
-                args = [chrome_path, "--new-window", url]
-                subprocess.Popen(args)
-                time.sleep(2)  # Czekaj, aż okno się otworzy
+            jobs.append(RestoreJob(index, url, monitor, entry.get("mode", LEGACY_LAUNCH_MODE)))
 
-                chrome_windows = [w for w in gw.getAllWindows() if "Chrome" in w.title]
-                newest_window = max(chrome_windows, key=lambda w: w._hWnd, default=None)
+        engine = RestoreEngine(chrome_path, profile_dir=CHROME_PROFILE_DIR)
 
-                if newest_window:
-                    newest_window.moveTo(monitor.x, monitor.y)
-                    time.sleep(0.2)
-                    newest_window.resizeTo(monitor.width, monitor.height)
-                    time.sleep(0.2)
-                    newest_window.activate()
+        def work(task):
+            return engine.restore(
+                jobs,
+                on_progress=lambda job: task.advance(job.url, f"{job.url}: {job.error}" if job.error else None),
+                cancelled=task.cancelled,
+            )
 
-            except Exception as e:
-                messagebox.showerror("Błąd", f"Nie udało się uruchomić linku {url}:\n{e}")
+        def done(task):
+            self.update_window_list()
+            if task.errors:
+                messagebox.showerror("Błąd", "Nie udało się przywrócić części linków:\n" + "\n".join(task.errors))
+            else:
+                messagebox.showinfo("Gotowe", "Przywrócono wszystkie zapisane linki Chrome.")
 
-        messagebox.showinfo("Gotowe", "Przywrócono wszystkie zapisane linki Chrome.")
+        self.restore_task = self.tasks.submit(WindowTask("Przywracanie linków", len(jobs), work, on_done=done))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,118 @@
+import threading
+import time
+
+from screeninfo import get_monitors
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Co ile sekund sprawdzamy, czy zmienił się układ monitorów
+TOPOLOGY_INTERVAL = 2.0
+
+
+def rect_intersection_area(r1, r2):
+    x1 = max(r1[0], r2[0])
+    y1 = max(r1[1], r2[1])
+    x2 = min(r1[0] + r1[2], r2[0] + r2[2])
+    y2 = min(r1[1] + r1[3], r2[1] + r2[3])
+
+    width = max(0, x2 - x1)
+    height = max(0, y2 - y1)
+    return width * height
+
+
+def monitor_ids(monitors):
+    # Nazwa urządzenia (np. \\.\DISPLAY2) nie zmienia się przy zmianie kolejności monitorów;
+    # bez nazwy zostaje geometria, a powtórzenia dostają numer
+    ids = []
+    for m in monitors:
+        base = m.name or f"{m.width}x{m.height}@{m.x},{m.y}"
+        monitor_id = base
+        n = 2
+        while monitor_id in ids:
+            monitor_id = f"{base}#{n}"
+            n += 1
+        ids.append(monitor_id)
+    return ids
+
+
+class MonitorLayout:
+    """Niezmienny stan monitorów w danej wersji: kolejność, stabilne identyfikatory i etykiety."""
+
+    def __init__(self, monitors, version):
+        self.monitors = monitors
+        self.version = version
+        self.ids = monitor_ids(monitors)
+        self.labels = [
+            f"Monitor {i + 1} ({m.width}x{m.height} @ {m.x},{m.y})" for i, m in enumerate(monitors)
+        ]
+        self.index_by_id = {monitor_id: i for i, monitor_id in enumerate(self.ids)}
+        self.key = tuple((monitor_id, m.x, m.y, m.width, m.height) for monitor_id, m in zip(self.ids, monitors))
+        if np is not None and monitors:
+            self.boxes = np.array([(m.x, m.y, m.x + m.width, m.y + m.height) for m in monitors], dtype=np.int64)
+        else:
+            self.boxes = None
+
+    def monitor(self, monitor_id):
+        index = self.index_by_id.get(monitor_id)
+        return self.monitors[index] if index is not None else None
+
+    def label(self, monitor_id):
+        index = self.index_by_id.get(monitor_id)
+        return self.labels[index] if index is not None else "Nieznany monitor"
+
+    def assign(self, rects):
+        """Identyfikator monitora (albo None) dla każdego prostokąta (x, y, szer., wys.) – wszystkie naraz."""
+        if not rects or not self.monitors:
+            return [None] * len(rects)
+
+        if self.boxes is None:
+            result = []
+            for rect in rects:
+                areas = [rect_intersection_area(rect, (m.x, m.y, m.width, m.height)) for m in self.monitors]
+                best = max(range(len(areas)), key=areas.__getitem__)
+                result.append(self.ids[best] if areas[best] > 0 else None)
+            return result
+
+        # Macierz okna × monitory z polami przecięć, liczona jednym przebiegiem numpy
+        windows = np.array(rects, dtype=np.int64).reshape(-1, 4)
+        x1 = np.maximum(windows[:, None, 0], self.boxes[None, :, 0])
+        y1 = np.maximum(windows[:, None, 1], self.boxes[None, :, 1])
+        x2 = np.minimum((windows[:, 0] + windows[:, 2])[:, None], self.boxes[None, :, 2])
+        y2 = np.minimum((windows[:, 1] + windows[:, 3])[:, None], self.boxes[None, :, 3])
+        areas = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+        best = areas.argmax(axis=1)
+        found = areas[np.arange(len(best)), best] > 0
+        return [self.ids[i] if ok else None for i, ok in zip(best.tolist(), found.tolist())]
+
+
+class MonitorTopology:
+    """Bieżący układ monitorów, sprawdzany w tle; po podłączeniu, odłączeniu lub przestawieniu monitora rośnie wersja."""
+
+    def __init__(self, interval=TOPOLOGY_INTERVAL):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.layout = MonitorLayout(get_monitors(), 1)
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True, name="monitor-topology")
+        self.thread.start()
+
+    def refresh(self):
+        layout = MonitorLayout(get_monitors(), self.layout.version + 1)
+        with self.lock:
+            if layout.key == self.layout.key:
+                return False
+            self.layout = layout
+            return True
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Błąd odczytu monitorów: {e}")
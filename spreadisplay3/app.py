@@ -1,14 +1,34 @@
 import os
+import io
 import json
+import hashlib
 import threading
 import time
-from flask import Flask, request, jsonify, render_template, send_file, flash, redirect, url_for
+from concurrent.futures import Future
+from flask import Flask, Response, g, request, jsonify, render_template, send_file, flash, redirect, url_for
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from dotenv import load_dotenv
+from PIL import Image
+from driver_pool import DriverPool
+from readiness import drain_network_log, wait_for_script, wait_until_ready
+from scheduler import Scheduler
+from render_cache import RenderCache, capture_key
+from encoder import FORMATS, FrameEncoder
+from frame_diff import changed_ratio, exact_changed_ratio, signature, signature_from_file
+from snapshot_store import SnapshotStore
+from json_store import JsonStore
+from events import EventBus, sse_stream
+from shared_state import SharedState
+from grafana_session import SessionCache
+from backends import GrafanaRenderBackend, SeleniumBackend
+from tabs import capture_screenshot, has_tabs, tab_set
+from history import SnapshotHistory
+from wall import WallComposer
+from metrics import Registry, render as render_metrics
 
 load_dotenv()
 
@@ -16,7 +36,70 @@ app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "default_secret_key_for_dev")
 
 LINKS_FILE = 'tv_links.json'
+SETTINGS_FILE = 'monitor_settings.json'
 SNAPSHOT_DIR = 'snapshots'
+SNAPSHOT_DRIVERS = int(os.getenv('SNAPSHOT_DRIVERS', '3'))
+SNAPSHOT_INTERVAL = int(os.getenv('SNAPSHOT_INTERVAL', '30'))
+# "ready" – czekanie na sygnały gotowości strony, "sleep" – stare stałe opóźnienia
+CAPTURE_MODE = os.getenv('CAPTURE_MODE', 'ready')
+READY_TIMEOUT = float(os.getenv('READY_TIMEOUT', '20'))
+# Monitory, których nikt nie oglądał przez VIEWER_IDLE_AFTER sekund, mogą być pomijane
+SKIP_IDLE_MONITORS = os.getenv('SKIP_IDLE_MONITORS', '0') == '1'
+VIEWER_IDLE_AFTER = int(os.getenv('VIEWER_IDLE_AFTER', '300'))
+STARTED_AT = time.time()
+# Dodatkowe formaty kodowane po każdym zrzucie (PNG zawsze zostaje jako oryginał)
+SNAPSHOT_FORMATS = os.getenv('SNAPSHOT_FORMATS', 'webp,jpeg,thumb').split(',')
+WEBP_QUALITY = int(os.getenv('WEBP_QUALITY', '80'))
+JPEG_QUALITY = int(os.getenv('JPEG_QUALITY', '85'))
+THUMB_WIDTH = int(os.getenv('THUMB_WIDTH', '480'))
+# Klatka, w której zmieniło się nie więcej niż CHANGE_THRESHOLD bloków, nie jest publikowana
+CHANGE_THRESHOLD = float(os.getenv('CHANGE_THRESHOLD', '0'))
+# Co ile sekund sprawdzamy zmiany zapisane przez inne procesy (linki, indeks snapshotów)
+CHANGE_POLL_INTERVAL = float(os.getenv('CHANGE_POLL_INTERVAL', '0.5'))
+# Co ile sekund proces przechwytywania publikuje swój stan dla procesów WWW
+STATUS_INTERVAL = float(os.getenv('STATUS_INTERVAL', '1'))
+# Sesja Grafany bez terminu w ciasteczkach jest odnawiana po GRAFANA_SESSION_MAX_AGE sekundach
+GRAFANA_SESSION_MAX_AGE = int(os.getenv('GRAFANA_SESSION_MAX_AGE', '3600'))
+GRAFANA_SESSION_REFRESH_BEFORE = int(os.getenv('GRAFANA_SESSION_REFRESH_BEFORE', '300'))
+# Historia klatek każdego monitora: limit liczby klatek i zajętego miejsca (MB) na monitor
+HISTORY_FRAMES = int(os.getenv('HISTORY_FRAMES', '120'))
+HISTORY_MAX_MB = int(os.getenv('HISTORY_MAX_MB', '50'))
+# /stream/<tv_id>: maksymalna liczba klatek na sekundę na widza i co ile sekund strumień zgłasza, że działa
+STREAM_MAX_FPS = float(os.getenv('STREAM_MAX_FPS', '2'))
+STREAM_HEARTBEAT = float(os.getenv('STREAM_HEARTBEAT', '5'))
+# Co ile sekund każdy proces zapisuje swoje metryki dla /metrics
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '5'))
+# Tryb "tab": karta jest przeładowywana po TAB_MAX_AGE s, a nieużywana przez TAB_IDLE_CLOSE s zamykana
+TAB_MAX_AGE = int(os.getenv('TAB_MAX_AGE', '1800'))
+TAB_IDLE_CLOSE = int(os.getenv('TAB_IDLE_CLOSE', '600'))
+TAB_READY_TIMEOUT = float(os.getenv('TAB_READY_TIMEOUT', '2'))
+# Wymiana przeglądarki po limicie zrzutów, pamięci (MB, cały Chrome), wieku (s) lub błędów z rzędu; 0 = bez limitu
+DRIVER_MAX_CAPTURES = int(os.getenv('DRIVER_MAX_CAPTURES', '500'))
+DRIVER_MAX_RSS_MB = int(os.getenv('DRIVER_MAX_RSS_MB', '1500'))
+DRIVER_MAX_AGE = int(os.getenv('DRIVER_MAX_AGE', '0'))
+DRIVER_MAX_ERRORS = int(os.getenv('DRIVER_MAX_ERRORS', '3'))
+# Backend "render": równoległe zapytania do /render Grafany i opcjonalny token konta serwisowego
+RENDER_WORKERS = int(os.getenv('RENDER_WORKERS', '2'))
+GRAFANA_RENDER_TOKEN = os.getenv('GRAFANA_RENDER_TOKEN')
+
+capture_stats = {}
+capture_stats_lock = threading.Lock()
+capture_running = threading.Event()
+frame_signatures = {}
+event_bus = EventBus()
+announced_versions = {'snapshots': {}}
+announce_lock = threading.Lock()
+change_watcher_started = threading.Event()
+metrics_flusher_started = threading.Event()
+# tv_id -> (wersja, JPEG) ostatniej klatki strumienia, wspólne dla wszystkich widzów w procesie
+stream_frames = {}
+stream_frames_lock = threading.Lock()
+
+metrics = Registry()
+metrics.histogram('capture_stage_seconds', 'Czas etapów przechwytywania zrzutu')
+metrics.histogram('capture_duration_seconds', 'Czas renderowania zrzutu monitora (od nawigacji do zrzutu)')
+metrics.counter('captures_total', 'Zrzuty monitorów według wyniku (changed, unchanged, failed)')
+metrics.histogram('http_request_duration_seconds', 'Czas obsługi żądań HTTP według endpointu')
 
 if not os.path.exists(LINKS_FILE):
     default_links = {
@@ -33,13 +116,123 @@ if not os.path.exists(LINKS_FILE):
 if not os.path.exists(SNAPSHOT_DIR):
     os.makedirs(SNAPSHOT_DIR)
 
+snapshot_store = SnapshotStore(SNAPSHOT_DIR, FORMATS)
+shared_state = SharedState(SNAPSHOT_DIR)
+wall_composer = WallComposer(snapshot_store, THUMB_WIDTH, JPEG_QUALITY, WEBP_QUALITY)
+snapshot_history = SnapshotHistory(SNAPSHOT_DIR, HISTORY_FRAMES, HISTORY_MAX_MB * 2**20)
+links_store = JsonStore(LINKS_FILE, versioned=True)
+settings_store = JsonStore(SETTINGS_FILE)
+
 def load_links():
-    with open(LINKS_FILE, 'r') as f:
-        return json.load(f)
+    return links_store.read()
 
 def save_links(links):
-    with open(LINKS_FILE, 'w') as f:
-        json.dump(links, f, indent=2)
+    links_store.write(links)
+
+def load_monitor_settings():
+    return settings_store.read()
+
+def load_monitors():
+    settings = load_monitor_settings()
+    streamed = shared_state.active_streams(3 * STREAM_HEARTBEAT)
+    monitors = {}
+    for tv_id, url in load_links().items():
+        monitor_settings = settings.get(tv_id, {})
+        # Gdy ktoś ogląda strumień monitora, zrzuty są robione co stream_interval sekund
+        if tv_id in streamed and 'stream_interval' in monitor_settings:
+            monitor_settings = dict(monitor_settings, interval=monitor_settings['stream_interval'])
+        monitors[tv_id] = (url, monitor_settings)
+    return monitors
+
+def capture_status():
+    # W trybie produkcyjnym przechwytywanie działa w osobnym procesie i publikuje stan do status.json
+    if not capture_running.is_set():
+        return shared_state.read_status()
+
+    with capture_stats_lock:
+        captures = dict(capture_stats)
+    return {
+        'schedule': scheduler.status(),
+        'drivers': driver_pool.health(),
+        'pending': driver_pool.pending(),
+        'captures': captures,
+        'session': grafana_session.status(),
+        'render': render_backend.health(),
+    }
+
+def next_capture_at(tv_id):
+    if capture_running.is_set():
+        return scheduler.next_capture(tv_id)
+    return capture_status().get('schedule', {}).get(tv_id, {}).get('next_capture')
+
+def cache_max_age(tv_id):
+    # Klient może trzymać obraz do najbliższego planowanego zrzutu
+    next_capture = next_capture_at(tv_id)
+    if next_capture is None:
+        settings = load_monitor_settings().get(tv_id, {})
+        return int(settings.get('interval', SNAPSHOT_INTERVAL))
+    return max(0, int(next_capture - time.time()))
+
+def announce_changes():
+    # Zdarzenia wysyłamy tylko dla wersji, których subskrybenci jeszcze nie dostali
+    with announce_lock:
+        load_links()
+        if announced_versions.get('links') != links_store.version:
+            announced_versions['links'] = links_store.version
+            event_bus.publish('links', {'version': links_store.version})
+
+        snapshots = announced_versions['snapshots']
+        for tv_id, version in snapshot_store.versions().items():
+            if snapshots.get(tv_id) != version:
+                snapshots[tv_id] = version
+                event_bus.publish('snapshot', {'tv_id': tv_id, 'version': version})
+
+def watch_changes():
+    while True:
+        try:
+            announce_changes()
+        except Exception as e:
+            print(f"❌ Błąd śledzenia zmian: {e}")
+        time.sleep(CHANGE_POLL_INTERVAL)
+
+def start_change_watcher():
+    with announce_lock:
+        if change_watcher_started.is_set():
+            return
+        change_watcher_started.set()
+    announce_changes()
+    threading.Thread(target=watch_changes, daemon=True, name='change-watcher').start()
+
+def flush_metrics():
+    while True:
+        try:
+            metrics.dump(SNAPSHOT_DIR)
+        except Exception as e:
+            print(f"❌ Błąd zapisu metryk: {e}")
+        time.sleep(METRICS_FLUSH_INTERVAL)
+
+def start_metrics_flusher():
+    with announce_lock:
+        if metrics_flusher_started.is_set():
+            return
+        metrics_flusher_started.set()
+    threading.Thread(target=flush_metrics, daemon=True, name='metrics-flush').start()
+
+# Strumienie (SSE) trwają dowolnie długo – ich czas nic nie mówi o wydajności
+UNTIMED_ENDPOINTS = {'api_events', 'stream', 'static'}
+
+@app.before_request
+def start_request_timer():
+    start_metrics_flusher()
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def observe_request(response):
+    started = g.pop('request_started', None)
+    if started is not None and request.endpoint not in UNTIMED_ENDPOINTS:
+        metrics.observe('http_request_duration_seconds', time.perf_counter() - started,
+                        endpoint=request.endpoint or 'unknown')
+    return response
 
 def is_valid_url(url):
     return url.startswith(('http://', 'https://')) and len(url) > 10
@@ -52,20 +245,23 @@ def admin_panel():
 @app.route('/update_links', methods=['POST'])
 def update_links():
     links = load_links()
-    updated_count = 0
+    updates = {}
 
     for tv in links.keys():
         new_url = request.form.get(tv)
         if new_url and new_url != links[tv]:
             if is_valid_url(new_url):
-                links[tv] = new_url
-                updated_count += 1
+                updates[tv] = new_url
             else:
                 flash(f'Nieprawidłowy URL dla {tv}: {new_url}', 'error')
                 return redirect(url_for('admin_panel'))
 
-    save_links(links)
+    with links_store.edit() as links:
+        for tv, new_url in updates.items():
+            if tv in links:
+                links[tv] = new_url
 
+    updated_count = len(updates)
     if updated_count > 0:
         flash(f'Pomyślnie zaktualizowano {updated_count} linków!', 'success')
     else:
@@ -85,28 +281,21 @@ def rename_monitor():
     if old_name == new_name:
         return jsonify({'success': False, 'message': 'Nowa nazwa jest taka sama jak stara'})
 
-    links = load_links()
+    with links_store.edit() as links:
+        if old_name not in links:
+            return jsonify({'success': False, 'message': 'Monitor o tej nazwie nie istnieje'})
 
-    if old_name not in links:
-        return jsonify({'success': False, 'message': 'Monitor o tej nazwie nie istnieje'})
-
-    if new_name in links:
-        return jsonify({'success': False, 'message': 'Monitor o tej nazwie już istnieje'})
+        if new_name in links:
+            return jsonify({'success': False, 'message': 'Monitor o tej nazwie już istnieje'})
 
-    links[new_name] = links[old_name]
-    del links[old_name]
-    save_links(links)
+        links[new_name] = links.pop(old_name)
 
-    old_snapshot = os.path.join(SNAPSHOT_DIR, f'{old_name}.png')
-    new_snapshot = os.path.join(SNAPSHOT_DIR, f'{new_name}.png')
+    with settings_store.edit() as settings:
+        if old_name in settings:
+            settings[new_name] = settings.pop(old_name)
 
-    if os.path.exists(old_snapshot):
-        os.rename(old_snapshot, new_snapshot)
-    else:
-        time.sleep(0.1)
-        snapshot_path = os.path.join(SNAPSHOT_DIR, f"{old_name}.png")
-        if os.path.exists(snapshot_path):
-            os.remove(snapshot_path)
+    snapshot_store.rename(old_name, new_name)
+    snapshot_history.rename(old_name, new_name)
 
     return jsonify({'success': True, 'message': f'Monitor "{old_name}" został przemianowany na "{new_name}"'})
 
@@ -119,16 +308,14 @@ def add_monitor():
     if not monitor_name:
         return jsonify({'success': False, 'message': 'Nazwa monitora jest wymagana'})
 
-    links = load_links()
-
-    if monitor_name in links:
-        return jsonify({'success': False, 'message': 'Monitor o tej nazwie już istnieje'})
+    with links_store.edit() as links:
+        if monitor_name in links:
+            return jsonify({'success': False, 'message': 'Monitor o tej nazwie już istnieje'})
 
-    if not is_valid_url(monitor_url):
-        return jsonify({'success': False, 'message': 'Nieprawidłowy format URL'})
+        if not is_valid_url(monitor_url):
+            return jsonify({'success': False, 'message': 'Nieprawidłowy format URL'})
 
-    links[monitor_name] = monitor_url
-    save_links(links)
+        links[monitor_name] = monitor_url
 
     return jsonify({'success': True, 'message': f'Monitor "{monitor_name}" został dodany'})
 
@@ -140,20 +327,20 @@ def delete_monitor():
     if not monitor_name:
         return jsonify({'success': False, 'message': 'Nazwa monitora jest wymagana'})
 
-    links = load_links()
+    with links_store.edit() as links:
+        if monitor_name not in links:
+            return jsonify({'success': False, 'message': 'Monitor o tej nazwie nie istnieje'})
 
-    if monitor_name not in links:
-        return jsonify({'success': False, 'message': 'Monitor o tej nazwie nie istnieje'})
+        if len(links) <= 1:
+            return jsonify({'success': False, 'message': 'Nie można usunąć ostatniego monitora'})
 
-    if len(links) <= 1:
-        return jsonify({'success': False, 'message': 'Nie można usunąć ostatniego monitora'})
+        del links[monitor_name]
 
-    del links[monitor_name]
-    save_links(links)
+    with settings_store.edit() as settings:
+        settings.pop(monitor_name, None)
 
-    snapshot_path = os.path.join(SNAPSHOT_DIR, f'{monitor_name}.png')
-    if os.path.exists(snapshot_path):
-        os.remove(snapshot_path)
+    snapshot_store.delete(monitor_name)
+    snapshot_history.delete(monitor_name)
 
     return jsonify({'success': True, 'message': f'Monitor "{monitor_name}" został usunięty'})
 
@@ -173,7 +360,107 @@ def reset_links():
 
 @app.route('/api/links')
 def api_links():
-    return jsonify(load_links())
+    response = jsonify(load_links())
+    response.headers['X-Links-Version'] = str(links_store.version)
+    return response
+
+@app.route('/api/events')
+def api_events():
+    start_change_watcher()
+
+    last_id = request.headers.get('Last-Event-ID') or request.args.get('last_id')
+
+    tv_filter = request.args.get('tv')
+    accept = None
+    record_views = None
+    if tv_filter:
+        watched = set(tv_filter.split(','))
+        accept = lambda event_type, data: event_type != 'snapshot' or data['tv_id'] in watched
+
+        def record_views():
+            # Telewizor z otwartym strumieniem ogląda monitor, nawet jeśli klatka się nie zmienia i /proxy nie jest pobierane
+            for tv_id in watched & set(load_links()):
+                shared_state.record_view(tv_id)
+
+    reset_data = lambda: {'links': links_store.version, 'snapshots': snapshot_store.versions()}
+    response = Response(sse_stream(event_bus, last_id, accept, reset_data=reset_data, on_heartbeat=record_views),
+                        mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def stream_frame(tv_id):
+    # Gotowy wariant JPEG bieżącej wersji, a jeśli jeszcze go nie ma – JPEG zakodowany z PNG
+    info = snapshot_store.current(tv_id)
+    if info is None:
+        return None
+    with stream_frames_lock:
+        cached = stream_frames.get(tv_id)
+    if cached and cached[0] == info['version']:
+        return cached
+
+    jpeg = snapshot_store.current(tv_id, 'jpeg')
+    try:
+        if jpeg is not None and jpeg['version'] == info['version']:
+            with open(jpeg['path'], 'rb') as f:
+                data = f.read()
+        else:
+            with Image.open(info['path']) as image:
+                buffer = io.BytesIO()
+                image.convert('RGB').save(buffer, 'JPEG', quality=JPEG_QUALITY)
+                data = buffer.getvalue()
+    except OSError:
+        # Wersja została właśnie zastąpiona nowszą – następna próba weźmie nowy plik
+        return None
+
+    frame = (info['version'], data)
+    with stream_frames_lock:
+        stream_frames[tv_id] = frame
+    return frame
+
+def mjpeg_stream(tv_id, fps):
+    # Klatka jest wysyłana tylko po zmianie wersji snapshotu i nie częściej niż fps razy na sekundę
+    min_gap = 1 / fps
+    last_version = None
+    last_sent = 0
+    last_event = event_bus.last_seq
+    heartbeat_at = 0
+
+    while True:
+        now = time.time()
+        if now - heartbeat_at >= STREAM_HEARTBEAT:
+            if tv_id not in load_links():
+                return
+            shared_state.record_stream(tv_id)
+            shared_state.record_view(tv_id)
+            heartbeat_at = now
+
+        frame = stream_frame(tv_id)
+        if frame is not None and frame[0] != last_version:
+            delay = last_sent + min_gap - now
+            if delay > 0:
+                time.sleep(delay)
+                continue
+            last_version, data = frame
+            last_sent = time.time()
+            yield (b'--frame\r\nContent-Type: image/jpeg\r\nContent-Length: '
+                   + str(len(data)).encode() + b'\r\n\r\n' + data + b'\r\n')
+
+        events = event_bus.wait(last_event, STREAM_HEARTBEAT)
+        if events:
+            last_event = events[-1][0]
+
+@app.route('/stream/<tv_id>')
+def stream(tv_id):
+    if tv_id not in load_links():
+        return f"Monitor '{tv_id}' nie istnieje", 404
+    start_change_watcher()
+
+    fps = min(max(request.args.get('fps', STREAM_MAX_FPS, type=float), 0.1), STREAM_MAX_FPS)
+    response = Response(mjpeg_stream(tv_id, fps), mimetype='multipart/x-mixed-replace; boundary=frame')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 @app.route('/api/validate_url', methods=['POST'])
 def validate_url():
@@ -185,12 +472,172 @@ def validate_url():
     else:
         return jsonify({'valid': False, 'message': 'Nieprawidłowy format URL'})
 
+def requested_format():
+    fmt = request.args.get('format')
+    if fmt in FORMATS:
+        return fmt
+    if any(mimetype == 'image/webp' and quality > 0 for mimetype, quality in request.accept_mimetypes):
+        return 'webp'
+    return 'png'
+
+def parse_timestamp(name):
+    value = request.args.get(name)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+def history_frame(tv_id):
+    if tv_id not in load_links():
+        return f"Monitor '{tv_id}' nie istnieje", 404
+    at = parse_timestamp('at')
+    if at is None:
+        return "Parametr 'at' musi być znacznikiem czasu (s)", 400
+
+    frame = snapshot_history.frame_at(tv_id, at)
+    if frame is None:
+        return f"Brak klatki monitora '{tv_id}' z chwili {at}", 404
+
+    # Klatki z historii nigdy się nie zmieniają
+    ext = frame['name'].split('.', 1)[1]
+    fmt = next((fmt for fmt, (_, fmt_ext) in FORMATS.items() if fmt_ext == ext), 'png')
+    response = send_file(
+        frame['path'],
+        mimetype=FORMATS[fmt][0],
+        etag=frame['name'],
+        max_age=86400,
+        conditional=True,
+    )
+    response.headers['X-Frame-Timestamp'] = str(frame['at'])
+    return response
+
+@app.route('/api/history/<tv_id>')
+def api_history(tv_id):
+    if tv_id not in load_links():
+        return jsonify({'error': f"Monitor '{tv_id}' nie istnieje"}), 404
+
+    frames = snapshot_history.frames(tv_id, parse_timestamp('since'), parse_timestamp('until'))
+    return jsonify([
+        {'at': frame['at'], 'size': frame['size'], 'url': url_for('proxy', tv_id=tv_id, at=frame['at'])}
+        for frame in frames
+    ])
+
 @app.route('/proxy/<tv_id>')
 def proxy(tv_id):
-    snapshot_path = os.path.join(SNAPSHOT_DIR, f'{tv_id}.png')
-    if not os.path.exists(snapshot_path):
+    if 'at' in request.args:
+        return history_frame(tv_id)
+
+    fmt = requested_format()
+    info = snapshot_store.current(tv_id, fmt)
+    if info is None:
+        # Wariant może jeszcze nie być zakodowany – wtedy oddajemy oryginalny PNG
+        fmt = 'png'
+        info = snapshot_store.current(tv_id, fmt)
+    if info is None:
         return f"Snapshot dla TV id '{tv_id}' nie istnieje", 404
-    return send_file(snapshot_path, mimetype='image/png')
+    if fmt != 'thumb':
+        shared_state.record_view(tv_id)
+
+    response = send_file(
+        info['path'],
+        mimetype=FORMATS[fmt][0],
+        etag=info['etag'],
+        last_modified=info['mtime'],
+        max_age=cache_max_age(tv_id),
+        conditional=True,
+    )
+    response.vary.add('Accept')
+    return response
+
+@app.route('/wall')
+def wall():
+    links = load_links()
+    tv_ids = list(dict.fromkeys(tv_id for tv_id in request.args.get('tv', '').split(',') if tv_id)) or list(links)
+    missing = [tv_id for tv_id in tv_ids if tv_id not in links]
+    if missing:
+        return f"Nieznane monitory: {', '.join(missing)}", 404
+    if not tv_ids:
+        return "Brak monitorów", 404
+
+    width = min(max(request.args.get('width', 1920, type=int), 160), 3840)
+    height = min(max(request.args.get('height', 1080, type=int), 90), 2160)
+    columns = request.args.get('columns', type=int)
+    columns = min(max(columns, 1), len(tv_ids)) if columns else None
+    fmt = request.args.get('format')
+    if fmt not in ('png', 'jpeg', 'webp'):
+        fmt = 'webp' if requested_format() == 'webp' else 'jpeg'
+
+    data, etag = wall_composer.render(tv_ids, width, height, columns, fmt)
+    response = Response(data, mimetype=FORMATS[fmt][0])
+    response.set_etag(etag)
+    response.cache_control.max_age = min(cache_max_age(tv_id) for tv_id in tv_ids)
+    response.vary.add('Accept')
+    return response.make_conditional(request)
+
+@app.route('/metrics')
+def prometheus_metrics():
+    now = time.time()
+    status = capture_status()
+    captures = status.get('captures', {})
+    links = load_links()
+
+    capture_age = []
+    snapshot_age = []
+    for tv_id in links:
+        if tv_id in captures:
+            capture_age.append(({'tv_id': tv_id}, round(now - captures[tv_id]['captured_at'], 3)))
+        info = snapshot_store.current(tv_id)
+        if info is not None:
+            snapshot_age.append(({'tv_id': tv_id}, round(now - info['mtime'], 3)))
+
+    drivers = [({'driver': str(driver['index'])}, driver['rss_mb'] * 2**20)
+               for driver in status.get('drivers', []) if driver.get('rss_mb') is not None]
+
+    gauges = [
+        ('capture_age_seconds', 'Czas od ostatniego zrzutu monitora', capture_age),
+        ('snapshot_age_seconds', 'Czas od ostatniej zmiany obrazu monitora', snapshot_age),
+        ('capture_queue_pending', 'Zrzuty czekające na wolną przeglądarkę', [({}, status.get('pending', 0))]),
+        ('driver_rss_bytes', 'Pamięć przeglądarki (chromedriver + Chrome)', drivers),
+    ]
+    if 'updated_at' in status:
+        gauges.append(('capture_status_age_seconds', 'Czas od ostatniego raportu procesu przechwytywania',
+                       [({}, round(now - status['updated_at'], 3))]))
+
+    text = render_metrics('displaymanager', metrics.collect(SNAPSHOT_DIR), gauges)
+    return Response(text, mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/captures')
+def api_captures():
+    return jsonify(capture_status().get('captures', {}))
+
+@app.route('/api/schedule')
+def api_schedule():
+    return jsonify(capture_status().get('schedule', {}))
+
+@app.route('/capture_now', methods=['POST'])
+def capture_now():
+    data = request.get_json()
+    monitor_name = data.get('name')
+
+    if not monitor_name:
+        return jsonify({'success': False, 'message': 'Nazwa monitora jest wymagana'})
+
+    if monitor_name not in load_links():
+        return jsonify({'success': False, 'message': 'Monitor o tej nazwie nie istnieje'})
+
+    if capture_running.is_set():
+        scheduler.capture_now(monitor_name)
+    else:
+        shared_state.request_capture(monitor_name)
+
+    return jsonify({'success': True, 'message': f'Zlecono natychmiastowy zrzut monitora "{monitor_name}"'})
+
+@app.route('/api/drivers')
+def api_drivers():
+    status = capture_status()
+    return jsonify({'pending': status.get('pending', 0), 'drivers': status.get('drivers', [])})
 
 def login_to_grafana(driver):
     login_url = os.getenv("GRAFANA_LOGIN_URL")
@@ -222,55 +669,321 @@ def login_to_grafana(driver):
         print(f"❌ Błąd logowania do Grafany: {e}")
         return False
 
-def take_snapshot(tv_id, url, driver):
-    try:
-        driver.get(url)
-        time.sleep(3)
-
-        # Jeśli sesja wygasła, Grafana przekierowuje do logowania
-        if "login" in driver.current_url or "signin" in driver.current_url:
-            print(f"[{tv_id}] Sesja wygasła – ponowne logowanie...")
-            if not login_to_grafana(driver):
-                print(f"[{tv_id}] Nie udało się ponownie zalogować – pominięto snapshot.")
-                return
-            driver.get(url)
-            time.sleep(3)
-
-        driver.refresh()
-        time.sleep(5)
-
+def set_viewport(driver, settings):
+    with metrics.timer('capture_stage_seconds', stage='viewport'):
         driver.execute_cdp_cmd('Emulation.setDeviceMetricsOverride', {
             "mobile": False,
-            "width": 1920,
-            "height": 1020,
+            "width": int(settings.get('width', 1920)),
+            "height": int(settings.get('height', 1020)),
             "deviceScaleFactor": 1,
         })
-        time.sleep(2)
 
-        path = os.path.join(SNAPSHOT_DIR, f"{tv_id}.png")
-        driver.save_screenshot(path)
+def open_page(tv_id, url, driver, settle):
+    # Ciasteczka wspólnej sesji trafiają do przeglądarki przed nawigacją
+    with metrics.timer('capture_stage_seconds', stage='login'):
+        logged_in = grafana_session.apply(driver)
+    if not logged_in:
+        print(f"[{tv_id}] Brak sesji Grafany – pominięto snapshot.")
+        return False
+
+    drain_network_log(driver)
+    with metrics.timer('capture_stage_seconds', stage='navigate'):
+        driver.get(url)
+    time.sleep(settle)
+
+    # Awaryjnie: jeśli sesja mimo to wygasła, Grafana przekierowuje do logowania
+    if "login" in driver.current_url or "signin" in driver.current_url:
+        print(f"[{tv_id}] Sesja wygasła – ponowne logowanie...")
+        with metrics.timer('capture_stage_seconds', stage='login'):
+            logged_in = grafana_session.renew(driver)
+        if not logged_in:
+            print(f"[{tv_id}] Nie udało się ponownie zalogować – pominięto snapshot.")
+            return False
+        drain_network_log(driver)
+        with metrics.timer('capture_stage_seconds', stage='navigate'):
+            driver.get(url)
+        time.sleep(settle)
+
+    return True
+
+def render_tab(tv_id, url, settings, driver):
+    # Stała karta monitora: po pierwszym załadowaniu dashboard odświeża się sam, my tylko robimy zrzut
+    tabs = tab_set(driver)
+    tabs.close_idle(TAB_IDLE_CLOSE)
+    key = capture_key(url, settings)
+    tab = tabs.get(key)
+    timeout = settings.get('timeout', READY_TIMEOUT)
+    max_age = float(settings.get('tab_max_age', TAB_MAX_AGE))
+
+    if tab is not None:
+        try:
+            with metrics.timer('capture_stage_seconds', stage='tab_switch'):
+                tabs.switch(tab)
+        except Exception:
+            # Karta zniknęła (np. renderer się wysypał) – otwieramy ją od nowa
+            tabs.tabs.pop(key, None)
+            tabs.switch_home()
+            tab = None
+
+    if tab is not None and time.time() - tab['loaded_at'] < max_age \
+            and "login" not in driver.current_url and "signin" not in driver.current_url:
+        with metrics.timer('capture_stage_seconds', stage='ready'):
+            ready, signal = wait_for_script(driver, settings, TAB_READY_TIMEOUT)
+        return ready, signal or 'tab'
+
+    if tab is None:
+        tab = tabs.open(key, url)
+        print(f"[{tv_id}] Otwieram stałą kartę")
+    set_viewport(driver, settings)
+    if not open_page(tv_id, url, driver, 0):
+        tabs.close(key)
+        return None
+    tab['loaded_at'] = time.time()
+    with metrics.timer('capture_stage_seconds', stage='ready'):
+        return wait_until_ready(driver, settings, timeout)
+
+def render_page(tv_id, url, settings, driver):
+    mode = settings.get('mode', CAPTURE_MODE)
+    timeout = settings.get('timeout', READY_TIMEOUT)
 
-        print(f"[{tv_id}] Snapshot zapisany w 1920x1080")
+    try:
+        started = time.time()
+
+        if mode == 'tab':
+            result = render_tab(tv_id, url, settings, driver)
+            if result is None:
+                return False
+            ready, signal = result
+            with metrics.timer('capture_stage_seconds', stage='screenshot'):
+                png = capture_screenshot(driver)
+            grafana_session.update_from(driver)
+            return {
+                'png': png,
+                'rendered_at': time.time(),
+                'mode': mode,
+                'ready': ready,
+                'signal': signal,
+                'wait_seconds': round(time.time() - started, 3),
+            }
+
+        # Zwykłe zrzuty nawigują w pierwszym oknie, żeby nie zabrać karty innemu monitorowi
+        if has_tabs(driver):
+            tab_set(driver).switch_home()
+
+        if mode == 'sleep':
+            if not open_page(tv_id, url, driver, 3):
+                return False
+
+            with metrics.timer('capture_stage_seconds', stage='refresh'):
+                driver.refresh()
+            time.sleep(5)
+
+            set_viewport(driver, settings)
+            time.sleep(2)
+            ready, signal = True, 'sleep'
+        else:
+            # Viewport ustawiony przed nawigacją, żeby strona od razu renderowała się w docelowym rozmiarze
+            set_viewport(driver, settings)
+            if not open_page(tv_id, url, driver, 0):
+                return False
+
+            with metrics.timer('capture_stage_seconds', stage='ready'):
+                ready, signal = wait_until_ready(driver, settings, timeout)
+            if not ready:
+                print(f"[{tv_id}] Strona niegotowa po {timeout}s (ostatni sygnał: {signal}) – zapisuję bieżący stan")
+
+        waited = time.time() - started
+        grafana_session.update_from(driver)
+        with metrics.timer('capture_stage_seconds', stage='screenshot'):
+            png = driver.get_screenshot_as_png()
+
+        return {
+            'png': png,
+            'rendered_at': time.time(),
+            'mode': mode,
+            'ready': ready,
+            'signal': signal,
+            'wait_seconds': round(waited, 3),
+        }
 
     except Exception as e:
         print(f"[{tv_id}] Błąd snapshotu: {e}")
+        return False
 
-def snapshot_worker():
+def write_variants(tv_id, version, frame, future):
+    try:
+        variants = future.result()
+        with metrics.timer('capture_stage_seconds', stage='write'):
+            for fmt, data in variants.items():
+                snapshot_store.publish_variant(tv_id, version, fmt, data)
+            # Do historii trafia WebP (kilkukrotnie mniejszy), a gdy jest wyłączony – oryginalny PNG
+            if 'webp' in variants:
+                snapshot_history.add(tv_id, frame['rendered_at'], variants['webp'], FORMATS['webp'][1])
+            else:
+                snapshot_history.add(tv_id, frame['rendered_at'], frame['png'], FORMATS['png'][1])
+    except Exception as e:
+        print(f"[{tv_id}] Błąd kodowania snapshotu: {e}")
+
+def frame_change(tv_id, frame, threshold):
+    info = snapshot_store.current(tv_id)
+    if info is None:
+        return 1.0
+    if info['etag'] == hashlib.sha256(frame['png']).hexdigest():
+        return 0.0
+
+    if 'signature' not in frame:
+        frame['signature'] = signature(frame['png'])
+    previous = frame_signatures.get(tv_id)
+    if previous is None:
+        previous = signature_from_file(info['path'])
+    ratio = changed_ratio(previous, frame['signature'])
+    if ratio > 0 or threshold > 0:
+        return ratio
+
+    # Przy progu 0 liczy się każda zmiana, także taka, której nie widać w zmniejszonej sygnaturze
+    with open(info['path'], 'rb') as f:
+        return exact_changed_ratio(f.read(), frame['png'])
+
+def publish_snapshot(tv_id, frame, shared, settings):
+    # Monitor mógł zostać usunięty albo przemianowany w trakcie renderowania
+    if tv_id not in load_links():
+        return
+
+    threshold = float(settings.get('change_threshold', CHANGE_THRESHOLD))
+    with metrics.timer('capture_stage_seconds', stage='diff'):
+        ratio = frame_change(tv_id, frame, threshold)
+    changed = ratio > threshold
+    metrics.inc('captures_total', tv_id=tv_id, result='changed' if changed else 'unchanged')
+    metrics.observe('capture_duration_seconds', frame['wait_seconds'], tv_id=tv_id)
+
+    if changed:
+        with metrics.timer('capture_stage_seconds', stage='write'):
+            version = snapshot_store.publish(tv_id, frame['png'])
+        if 'signature' in frame:
+            frame_signatures[tv_id] = frame['signature']
+        else:
+            frame_signatures.pop(tv_id, None)
+        frame_encoder.encode(frame).add_done_callback(lambda f: write_variants(tv_id, version, frame, f))
+        if change_watcher_started.is_set():
+            announce_changes()
+
+    with capture_stats_lock:
+        previous = capture_stats.get(tv_id, {})
+        capture_stats[tv_id] = {
+            'mode': frame['mode'],
+            'ready': frame['ready'],
+            'signal': frame['signal'],
+            'wait_seconds': frame['wait_seconds'],
+            'captured_at': frame['rendered_at'],
+            'shared': shared,
+            'changed': changed,
+            'changed_pixel_ratio': round(ratio, 5),
+            'changed_at': frame['rendered_at'] if changed else previous.get('changed_at'),
+            'version': snapshot_store.current(tv_id)['version'],
+        }
+
+    if changed:
+        source = "współdzielony render" if shared else f"oczekiwanie {frame['wait_seconds']:.1f}s"
+        print(f"[{tv_id}] Snapshot zapisany ({source}, zmiana {ratio:.1%})")
+    else:
+        print(f"[{tv_id}] Bez zmian – snapshot pominięty")
+
+def create_driver():
     chrome_options = Options()
     chrome_options.add_argument('--headless')
     chrome_options.add_argument('--no-sandbox')
     chrome_options.add_argument('--disable-dev-shm-usage')
+    # Karty w tle (tryb "tab") muszą odświeżać się tak samo jak aktywna
+    chrome_options.add_argument('--disable-background-timer-throttling')
+    chrome_options.add_argument('--disable-backgrounding-occluded-windows')
+    chrome_options.add_argument('--disable-renderer-backgrounding')
+    # Zdarzenia sieciowe CDP potrzebne do wykrywania bezczynności sieci
+    chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
 
     driver = webdriver.Chrome(options=chrome_options)
     driver.set_window_size(1920, 1080)
 
-    if not login_to_grafana(driver):
-        print("❌ Przerwano robienie snapshotów – logowanie nie powiodło się.")
+    # Tylko pierwsza przeglądarka loguje się formularzem, kolejne dostają gotowe ciasteczka
+    if not grafana_session.apply(driver):
         driver.quit()
-        return
+        raise RuntimeError("logowanie do Grafany nie powiodło się")
 
+    return driver
+
+def is_viewed(tv_id, settings):
+    if not settings.get('skip_when_idle', SKIP_IDLE_MONITORS):
+        return True
+    if snapshot_store.current(tv_id) is None:
+        return True
+    return time.time() - (shared_state.last_view(tv_id) or STARTED_AT) < VIEWER_IDLE_AFTER
+
+def submit_capture(tv_id, url, settings, forced=False):
+    # Monitory z tym samym kluczem renderu dostają wspólny zrzut zamiast osobnego renderowania
+    key = capture_key(url, settings)
+    max_age = 0 if forced else float(settings.get('interval', SNAPSHOT_INTERVAL)) / 2
+    done = Future()
+    backend = capture_backends.get(settings.get('backend', 'selenium'))
+    if backend is None:
+        print(f"[{tv_id}] Nieznany backend przechwytywania: {settings.get('backend')}")
+        done.set_result(False)
+        return done
+
+    render_future, shared = render_cache.get(key, max_age, lambda: backend.submit(tv_id, url, settings))
+
+    def on_rendered(future):
+        try:
+            frame = future.result()
+            if frame:
+                publish_snapshot(tv_id, frame, shared, settings)
+            else:
+                metrics.inc('captures_total', tv_id=tv_id, result='failed')
+            done.set_result(bool(frame))
+        except Exception as e:
+            print(f"[{tv_id}] Błąd snapshotu: {e}")
+            metrics.inc('captures_total', tv_id=tv_id, result='failed')
+            done.set_result(False)
+
+    render_future.add_done_callback(on_rendered)
+    return done
+
+def tab_affinity(url, settings):
+    # Karta istnieje tylko w jednej przeglądarce, więc jej zrzuty muszą trafiać właśnie tam
+    if settings.get('mode', CAPTURE_MODE) == 'tab':
+        return capture_key(url, settings)
+    return None
+
+grafana_session = SessionCache(login_to_grafana, GRAFANA_SESSION_MAX_AGE, GRAFANA_SESSION_REFRESH_BEFORE)
+driver_pool = DriverPool(SNAPSHOT_DRIVERS, create_driver, DRIVER_MAX_CAPTURES, DRIVER_MAX_RSS_MB,
+                         DRIVER_MAX_AGE, DRIVER_MAX_ERRORS)
+render_backend = GrafanaRenderBackend(RENDER_WORKERS, GRAFANA_RENDER_TOKEN,
+                                      os.getenv("GRAFANA_USERNAME"), os.getenv("GRAFANA_PASSWORD"), READY_TIMEOUT)
+capture_backends = {
+    'selenium': SeleniumBackend(driver_pool, render_page, tab_affinity),
+    'render': render_backend,
+}
+render_cache = RenderCache()
+frame_encoder = FrameEncoder(SNAPSHOT_FORMATS, WEBP_QUALITY, JPEG_QUALITY, THUMB_WIDTH,
+                             observe=lambda seconds: metrics.observe('capture_stage_seconds', seconds, stage='encode'))
+scheduler = Scheduler(load_monitors, submit_capture, SNAPSHOT_DRIVERS + RENDER_WORKERS, SNAPSHOT_INTERVAL, is_viewed,
+                      capture_key=capture_key)
+
+def publish_status():
     while True:
-        links = load_links()
-        for tv_id, url in links.items():
-            take_snapshot(tv_id, url, driver)
-        time.sleep(30)
\ No newline at end of file
+        try:
+            for tv_id in shared_state.take_capture_requests():
+                scheduler.capture_now(tv_id)
+            shared_state.write_status(capture_status())
+            metrics.dump(SNAPSHOT_DIR)
+        except Exception as e:
+            print(f"❌ Błąd publikowania stanu przechwytywania: {e}")
+        time.sleep(STATUS_INTERVAL)
+
+def snapshot_worker():
+    if not shared_state.acquire_capture_lock():
+        print("❌ Przechwytywanie już działa w innym procesie – ten proces go nie uruchamia.")
+        return
+
+    capture_running.set()
+    driver_pool.start()
+    threading.Thread(target=publish_status, daemon=True, name='capture-status').start()
+    scheduler.run()
\ No newline at end of file
@@ -0,0 +1,124 @@
+import base64
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import urllib3
+
+# /d/<uid>/<slug> i /d-solo/<uid>/<slug> (także pod podścieżką, np. /grafana/d/...)
+DASHBOARD_PATH = re.compile(r'/(d|d-solo)/')
+
+
+class CaptureBackend:
+    """Sposób zamiany URL monitora na klatkę.
+
+    submit() zwraca Future z klatką (słownik z kluczami png, rendered_at, mode,
+    ready, signal, wait_seconds) albo z False, gdy zrzut się nie udał.
+    """
+
+    name = None
+
+    def submit(self, tv_id, url, settings):
+        raise NotImplementedError
+
+    def health(self):
+        return {}
+
+
+class SeleniumBackend(CaptureBackend):
+    """Domyślny backend: pełna przeglądarka z puli.
+
+    affinity(url, settings) może zwrócić klucz, który przypina zrzut do jednej przeglądarki.
+    """
+
+    name = 'selenium'
+
+    def __init__(self, driver_pool, render, affinity=None):
+        self.driver_pool = driver_pool
+        self.render = render
+        self.affinity = affinity
+
+    def submit(self, tv_id, url, settings):
+        key = self.affinity(url, settings) if self.affinity else None
+        return self.driver_pool.submit(self.render, tv_id, url, settings, affinity=key)
+
+    def health(self):
+        return {'pending': self.driver_pool.pending(), 'drivers': self.driver_pool.health()}
+
+
+class GrafanaRenderBackend(CaptureBackend):
+    """Obraz dashboardu pobierany z endpointu /render Grafany, bez przeglądarki po naszej stronie.
+
+    Zapytania idą przez wspólną pulę połączeń keep-alive (urllib3), a liczba
+    równoległych renderów jest ograniczona liczbą wątków.
+    """
+
+    name = 'render'
+
+    def __init__(self, workers=2, token=None, username=None, password=None, timeout=30):
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='render')
+        self.http = urllib3.PoolManager(num_pools=10, maxsize=workers, block=True, retries=False)
+        self.headers = {}
+        if token:
+            self.headers['Authorization'] = f'Bearer {token}'
+        elif username and password:
+            credentials = base64.b64encode(f'{username}:{password}'.encode()).decode()
+            self.headers['Authorization'] = f'Basic {credentials}'
+        self.requests = 0
+        self.errors = 0
+        self.last_error = None
+
+    def submit(self, tv_id, url, settings):
+        return self.executor.submit(self._render, tv_id, url, settings)
+
+    def health(self):
+        return {'requests': self.requests, 'errors': self.errors, 'last_error': self.last_error}
+
+    def _render(self, tv_id, url, settings):
+        started = time.time()
+        timeout = float(settings.get('timeout', self.timeout))
+        self.requests += 1
+
+        try:
+            response = self.http.request(
+                'GET', render_url(url, settings, timeout),
+                headers=self.headers,
+                timeout=urllib3.Timeout(connect=5, read=timeout + 10),
+            )
+            content_type = response.headers.get('Content-Type', '')
+            if response.status != 200 or not content_type.startswith('image/png'):
+                raise RuntimeError(f"HTTP {response.status} ({content_type or 'brak typu'})")
+        except Exception as e:
+            self.errors += 1
+            self.last_error = str(e)
+            print(f"[{tv_id}] Błąd renderowania przez Grafanę: {e}")
+            return False
+
+        return {
+            'png': response.data,
+            'rendered_at': time.time(),
+            'mode': 'render',
+            'ready': True,
+            'signal': 'render',
+            'wait_seconds': round(time.time() - started, 3),
+        }
+
+
+def render_url(url, settings, timeout):
+    # Ten sam dashboard pod /render/..., z rozmiarem monitora; parametry z URL monitora zostają
+    parts = urlsplit(url)
+    if not DASHBOARD_PATH.search(parts.path):
+        raise ValueError(f"to nie jest URL dashboardu Grafany: {url}")
+
+    path = DASHBOARD_PATH.sub(r'/render/\1/', parts.path, count=1)
+    # Lista par, nie słownik: zmienne wielowartościowe (var-host=a&var-host=b) muszą przejść w całości
+    query = [(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+             if key not in ('width', 'height', 'timeout')]
+    query += [
+        ('width', int(settings.get('width', 1920))),
+        ('height', int(settings.get('height', 1020))),
+        ('timeout', int(timeout)),
+    ]
+    return urlunsplit((parts.scheme, parts.netloc, path, urlencode(query), ''))
@@ -0,0 +1,134 @@
+import base64
+import hashlib
+import io
+import threading
+import time
+import urllib.request
+
+from PIL import Image, ImageDraw
+
+# sha256 każdego wygenerowanego PNG -> chwila zrzutu; pozwala policzyć, jak stare klatki dostają TV
+rendered_frames = {}
+rendered_frames_lock = threading.Lock()
+
+
+class Latency:
+    """Opóźnienia symulowanej przeglądarki w sekundach."""
+
+    def __init__(self, navigate=0.3, ready=0.5, screenshot=0.05, login=0.5):
+        self.navigate = navigate
+        self.ready = ready
+        self.screenshot = screenshot
+        self.login = login
+
+
+class _SwitchTo:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def new_window(self, kind):
+        self.driver.window_count += 1
+        handle = f'tab-{self.driver.window_count}'
+        self.driver.windows[handle] = {'url': 'about:blank', 'loaded_at': 0}
+        self.driver.current_window_handle = handle
+
+    def window(self, handle):
+        if handle not in self.driver.windows:
+            raise RuntimeError(f'no such window: {handle}')
+        self.driver.current_window_handle = handle
+
+
+class FakeChrome:
+    """Zamiennik webdriver.Chrome: pobiera stronę z lokalnego serwera i generuje zrzut PNG.
+
+    Obsługuje tylko te wywołania, których używa spreadisplay3 (nawigacja, CDP,
+    karty, ciasteczka, log "performance"), z opóźnieniami z `latency`.
+    """
+
+    latency = Latency()
+    size = (1920, 1020)
+    # Co który render obraz dashboardu się zmienia (1 – każdy)
+    change_every = 1
+
+    def __init__(self, options=None, **kwargs):
+        self.windows = {'home': {'url': 'about:blank', 'loaded_at': 0}}
+        self.window_count = 0
+        self.current_window_handle = 'home'
+        self.switch_to = _SwitchTo(self)
+        self.cookies = {}
+        self.renders = 0
+
+    @property
+    def current_url(self):
+        return self.windows[self.current_window_handle]['url']
+
+    def get(self, url):
+        started = time.time()
+        with urllib.request.urlopen(url, timeout=10) as response:
+            response.read()
+        time.sleep(max(0.0, self.latency.navigate - (time.time() - started)))
+        window = self.windows[self.current_window_handle]
+        window['url'] = url
+        window['loaded_at'] = time.time()
+
+    def refresh(self):
+        self.get(self.current_url)
+
+    def close(self):
+        del self.windows[self.current_window_handle]
+
+    def quit(self):
+        self.windows = {}
+
+    def set_window_size(self, width, height):
+        pass
+
+    def get_log(self, kind):
+        return []
+
+    def get_cookies(self):
+        return [{'name': name, 'value': value, 'domain': '127.0.0.1', 'path': '/'} for name, value in self.cookies.items()]
+
+    def execute_script(self, script, *args):
+        if 'readyState' in script:
+            loaded_at = self.windows[self.current_window_handle]['loaded_at']
+            return 'complete' if time.time() - loaded_at >= self.latency.ready else 'loading'
+        return True
+
+    def execute_cdp_cmd(self, command, params):
+        if command == 'Network.setCookies':
+            for cookie in params['cookies']:
+                self.cookies[cookie['name']] = cookie['value']
+        elif command == 'Network.clearBrowserCookies':
+            self.cookies = {}
+        elif command == 'Page.captureScreenshot':
+            return {'data': base64.b64encode(self.get_screenshot_as_png()).decode()}
+        return {}
+
+    def get_screenshot_as_png(self):
+        time.sleep(self.latency.screenshot)
+        self.renders += 1
+        png = render_frame(self.current_url, self.renders // self.change_every, self.size)
+        with rendered_frames_lock:
+            rendered_frames[hashlib.sha256(png).hexdigest()] = time.time()
+        return png
+
+
+def fake_login(driver):
+    time.sleep(FakeChrome.latency.login)
+    driver.cookies['grafana_session'] = 'bench'
+    return True
+
+
+def render_frame(url, step, size):
+    # Prosty "dashboard": tło zależne od URL-a i pasek przesuwający się z każdą zmianą
+    seed = int(hashlib.sha256(url.encode()).hexdigest()[:6], 16)
+    image = Image.new('RGB', size, ((seed >> 16) & 0x7f, (seed >> 8) & 0x7f, seed & 0x7f))
+    draw = ImageDraw.Draw(image)
+    bar = size[0] // 10
+    x = (step * bar) % size[0]
+    draw.rectangle((x, 0, x + bar, size[1]), fill=(240, 240, 240))
+    draw.text((20, 20), f'{url} #{step}', fill=(255, 255, 255))
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG')
+    return buffer.getvalue()
@@ -0,0 +1,49 @@
+import hashlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from fake_driver import render_frame, rendered_frames, rendered_frames_lock
+
+DASHBOARD_HTML = """<!doctype html>
+<html><head><title>{uid}</title></head>
+<body><div class="react-grid-item">{uid}</div></body></html>
+"""
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    """Testowe dashboardy: /d/<uid>/<slug> (HTML) i /render/d/<uid>/<slug> (PNG, jak API renderowania Grafany)."""
+
+    protocol_version = 'HTTP/1.1'
+    renders = 0
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        if path.startswith('/render/d/'):
+            PageHandler.renders += 1
+            png = render_frame(path[len('/render'):], PageHandler.renders, (1920, 1020))
+            with rendered_frames_lock:
+                rendered_frames[hashlib.sha256(png).hexdigest()] = time.time()
+            self._send(200, 'image/png', png)
+        elif path.startswith('/d/'):
+            uid = path.split('/')[2]
+            self._send(200, 'text/html; charset=utf-8', DASHBOARD_HTML.format(uid=uid).encode())
+        else:
+            self._send(404, 'text/plain', b'not found')
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_page_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), PageHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name='page-server').start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
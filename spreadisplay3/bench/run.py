@@ -0,0 +1,252 @@
+"""Benchmark spreadisplay3 bez sieci i bez Chrome.
+
+Uruchamia lokalny serwer z testowymi dashboardami, podmienia webdriver.Chrome na
+FakeChrome, startuje przechwytywanie i serwer aplikacji, a potem symuluje wiele
+TV odpytujących /proxy/<tv_id> i /api/links. Wynik (przepustowość, p50/p99,
+nieświeżość klatek) trafia na stdout albo do pliku jako JSON.
+
+    python bench/run.py --monitors 30 --tvs 100 --duration 30 --output wynik.json
+    python bench/run.py --compare poprzedni.json --output wynik.json
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, APP_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from fake_driver import FakeChrome, Latency, fake_login, rendered_frames, rendered_frames_lock
+from page_server import start_page_server
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark przechwytywania i serwowania zrzutów (offline).')
+    parser.add_argument('--monitors', type=int, default=30, help='liczba monitorów')
+    parser.add_argument('--dashboards', type=int, default=10, help='liczba różnych dashboardów (URL-i)')
+    parser.add_argument('--tvs', type=int, default=50, help='liczba symulowanych TV')
+    parser.add_argument('--duration', type=float, default=20, help='czas pomiaru (s)')
+    parser.add_argument('--warmup', type=float, default=5, help='czas na pierwsze zrzuty przed pomiarem (s)')
+    parser.add_argument('--drivers', type=int, default=3, help='SNAPSHOT_DRIVERS')
+    parser.add_argument('--interval', type=float, default=5, help='odstęp między zrzutami monitora (s)')
+    parser.add_argument('--mode', default='ready', choices=['ready', 'sleep', 'tab'], help='tryb przechwytywania')
+    parser.add_argument('--backend', default='selenium', choices=['selenium', 'render'], help='backend przechwytywania')
+    parser.add_argument('--poll', type=float, default=1, help='co ile sekund TV pobiera obraz')
+    parser.add_argument('--links-every', type=int, default=10, help='co które odpytanie TV pobiera też /api/links')
+    parser.add_argument('--navigate-ms', type=float, default=300)
+    parser.add_argument('--ready-ms', type=float, default=500)
+    parser.add_argument('--screenshot-ms', type=float, default=50)
+    parser.add_argument('--change-every', type=int, default=1, help='co który render obraz dashboardu się zmienia')
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1020)
+    parser.add_argument('--output', help='plik wynikowy JSON (domyślnie stdout)')
+    parser.add_argument('--compare', help='poprzedni wynik JSON do porównania')
+    return parser.parse_args()
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def summarize(latencies, duration):
+    return {
+        'requests': len(latencies),
+        'throughput_rps': round(len(latencies) / duration, 2),
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 3) if latencies else None,
+        'p90_ms': round(percentile(latencies, 0.9) * 1000, 3) if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3) if latencies else None,
+        'max_ms': round(max(latencies) * 1000, 3) if latencies else None,
+    }
+
+
+class SimulatedTv(threading.Thread):
+    """Jeden TV: jedno połączenie keep-alive, warunkowe pobieranie obrazu i co jakiś czas listy linków."""
+
+    def __init__(self, port, tv_id, args, stop):
+        super().__init__(daemon=True)
+        self.port = port
+        self.tv_id = tv_id
+        self.args = args
+        self.stop = stop
+        self.latencies = {'proxy': [], 'api_links': []}
+        self.statuses = {}
+        self.staleness = []
+        self.bytes = 0
+        self.errors = 0
+
+    def request(self, conn, path, headers):
+        started = time.perf_counter()
+        conn.request('GET', path, headers=headers)
+        response = conn.getresponse()
+        body = response.read()
+        elapsed = time.perf_counter() - started
+        self.statuses[response.status] = self.statuses.get(response.status, 0) + 1
+        self.bytes += len(body)
+        return response, elapsed
+
+    def run(self):
+        conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+        etag = None
+        polls = 0
+        while not self.stop.is_set():
+            try:
+                headers = {'If-None-Match': etag} if etag else {}
+                response, elapsed = self.request(conn, f'/proxy/{self.tv_id}?format=png', headers)
+                self.latencies['proxy'].append(elapsed)
+                if response.status == 200:
+                    etag = response.getheader('ETag')
+                if etag:
+                    with rendered_frames_lock:
+                        rendered_at = rendered_frames.get(etag.strip('"'))
+                    if rendered_at:
+                        self.staleness.append(time.time() - rendered_at)
+
+                polls += 1
+                if self.args.links_every and polls % self.args.links_every == 0:
+                    response, elapsed = self.request(conn, '/api/links', {})
+                    self.latencies['api_links'].append(elapsed)
+            except (OSError, http.client.HTTPException):
+                self.errors += 1
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+            self.stop.wait(self.args.poll)
+        conn.close()
+
+
+def prepare_workdir(args, base_url):
+    workdir = tempfile.mkdtemp(prefix='spreadisplay-bench-')
+    links = {f'tv{i + 1}': f'{base_url}/d/dash{i % args.dashboards}/bench?kiosk' for i in range(args.monitors)}
+    settings = {tv_id: {'interval': args.interval, 'mode': args.mode, 'backend': args.backend,
+                        'width': args.width, 'height': args.height}
+                for tv_id in links}
+    with open(os.path.join(workdir, 'tv_links.json'), 'w') as f:
+        json.dump(links, f)
+    with open(os.path.join(workdir, 'monitor_settings.json'), 'w') as f:
+        json.dump(settings, f)
+    return workdir, links
+
+
+def compare(previous, current):
+    # Stosunek nowy/stary dla najważniejszych liczb; < 1 przy czasach oznacza poprawę
+    report = {}
+    for section in ('proxy', 'api_links', 'staleness', 'captures'):
+        for key, value in current.get(section, {}).items():
+            old = previous.get(section, {}).get(key)
+            if isinstance(value, (int, float)) and isinstance(old, (int, float)) and old:
+                report[f'{section}.{key}'] = round(value / old, 3)
+    return report
+
+
+def main():
+    args = parse_args()
+    # Po przejściu do katalogu roboczego ścieżki względne przestałyby działać
+    args.output = os.path.abspath(args.output) if args.output else None
+    args.compare = os.path.abspath(args.compare) if args.compare else None
+    # Komunikaty aplikacji idą na stderr, żeby stdout zawierał tylko wynik JSON
+    result_stream, sys.stdout = sys.stdout, sys.stderr
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    page_server, base_url = start_page_server()
+    workdir, links = prepare_workdir(args, base_url)
+    os.chdir(workdir)
+
+    os.environ.update({
+        'SNAPSHOT_DRIVERS': str(args.drivers),
+        'SNAPSHOT_INTERVAL': str(int(args.interval)),
+        'CAPTURE_MODE': args.mode,
+        'HISTORY_FRAMES': '10',
+    })
+    FakeChrome.latency = Latency(args.navigate_ms / 1000, args.ready_ms / 1000, args.screenshot_ms / 1000)
+    FakeChrome.size = (args.width, args.height)
+    FakeChrome.change_every = max(1, args.change_every)
+
+    from selenium import webdriver
+    webdriver.Chrome = FakeChrome
+    import app
+    import scheduler
+    from werkzeug.serving import make_server
+
+    app.webdriver.Chrome = FakeChrome
+    app.grafana_session.login = fake_login
+    scheduler.CONFIG_POLL_INTERVAL = 1
+
+    server = make_server('127.0.0.1', 0, app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True, name='bench-app').start()
+    threading.Thread(target=app.snapshot_worker, daemon=True, name='bench-capture').start()
+
+    time.sleep(args.warmup)
+    captures_before = sum(stats.get('version', 0) for stats in app.capture_stats.values())
+
+    stop = threading.Event()
+    tv_ids = list(links)
+    tvs = [SimulatedTv(server.server_port, tv_ids[i % len(tv_ids)], args, stop) for i in range(args.tvs)]
+    started = time.time()
+    for tv in tvs:
+        tv.start()
+    time.sleep(args.duration)
+    stop.set()
+    for tv in tvs:
+        tv.join()
+    duration = time.time() - started
+
+    with app.capture_stats_lock:
+        captures = dict(app.capture_stats)
+    statuses = {}
+    for tv in tvs:
+        for status, count in tv.statuses.items():
+            statuses[str(status)] = statuses.get(str(status), 0) + count
+    staleness = [value for tv in tvs for value in tv.staleness]
+    waits = [stats['wait_seconds'] for stats in captures.values()]
+    published = sum(stats.get('version', 0) for stats in captures.values()) - captures_before
+
+    result = {
+        'config': dict(vars(args), python=platform.python_version(), platform=platform.platform()),
+        'duration_s': round(duration, 3),
+        'proxy': summarize([value for tv in tvs for value in tv.latencies['proxy']], duration),
+        'api_links': summarize([value for tv in tvs for value in tv.latencies['api_links']], duration),
+        'statuses': statuses,
+        'errors': sum(tv.errors for tv in tvs),
+        'bytes_per_s': round(sum(tv.bytes for tv in tvs) / duration),
+        'staleness': {
+            'samples': len(staleness),
+            'p50_s': round(percentile(staleness, 0.5), 3) if staleness else None,
+            'p99_s': round(percentile(staleness, 0.99), 3) if staleness else None,
+            'max_s': round(max(staleness), 3) if staleness else None,
+        },
+        'captures': {
+            'published': published,
+            'published_per_s': round(published / duration, 2),
+            'last_wait_p50_s': round(percentile(waits, 0.5), 3) if waits else None,
+            'page_server_renders': page_server.RequestHandlerClass.renders,
+        },
+    }
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            result['compare'] = compare(json.load(f), result)
+
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        result_stream.write(output + '\n')
+        result_stream.flush()
+
+    server.shutdown()
+    page_server.shutdown()
+    # Wątki przechwytywania nie mają zatrzymania – kończymy cały proces
+    os._exit(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,11 @@
+import os
+import sys
+
+# Proces przechwytywania zrzutów uruchamiany obok serwera WWW (patrz serve.py)
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.getcwd())
+
+from app import snapshot_worker
+
+if __name__ == '__main__':
+    snapshot_worker()
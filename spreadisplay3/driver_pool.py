@@ -0,0 +1,256 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from process_memory import tree_rss
+
+RESTART_BACKOFF_MIN = 5
+RESTART_BACKOFF_MAX = 300
+# Pamięć przeglądarki sprawdzamy najwyżej co tyle sekund (odczyt drzewa procesów nie jest darmowy)
+RSS_CHECK_INTERVAL = 30
+
+
+class DriverSlot:
+    def __init__(self, index):
+        self.index = index
+        self.driver = None
+        self.status = 'starting'
+        self.captures = 0
+        self.errors = 0
+        self.restarts = 0
+        self.last_error = None
+        self.started_at = None
+        self.last_job_at = None
+        # Stan bieżącej przeglądarki – zerowany przy każdej wymianie
+        self.driver_captures = 0
+        self.consecutive_errors = 0
+        self.rss = None
+        self.rss_checked_at = 0
+        self.recycles = 0
+        self.recycle_reason = None
+        self.replacement = None
+        self.warming = False
+        # Zadania przypisane na stałe do tej przeglądarki (np. karty otwarte tylko w niej)
+        self.jobs = deque()
+
+    def health(self):
+        return {
+            'index': self.index,
+            'status': self.status,
+            'captures': self.captures,
+            'errors': self.errors,
+            'restarts': self.restarts,
+            'recycles': self.recycles,
+            'recycle_reason': self.recycle_reason,
+            'driver_captures': self.driver_captures,
+            'rss_mb': round(self.rss / 2**20, 1) if self.rss is not None else None,
+            'last_error': self.last_error,
+            'started_at': self.started_at,
+            'last_job_at': self.last_job_at,
+        }
+
+
+class DriverPool:
+    """Pula przeglądarek: każdy wątek ma własny driver i pobiera zadania ze wspólnej kolejki.
+
+    Przeglądarka jest wymieniana po max_captures zrzutach, po przekroczeniu max_rss_mb,
+    po max_age sekundach albo po max_errors błędach z rzędu (0 wyłącza dany limit).
+    Następca uruchamia się w tle, a stara przeglądarka obsługuje zadania do chwili,
+    gdy nowa jest gotowa.
+
+    Zadanie z kluczem affinity trafia zawsze do tej samej przeglądarki – klucz jest
+    przypisywany przy pierwszym użyciu przeglądarce z najmniejszą liczbą kluczy.
+    """
+
+    def __init__(self, size, create_driver, max_captures=0, max_rss_mb=0, max_age=0, max_errors=0):
+        self.size = max(1, size)
+        self.create_driver = create_driver
+        self.max_captures = max_captures
+        self.max_rss = max_rss_mb * 2**20
+        self.max_age = max_age
+        self.max_errors = max_errors
+        self.jobs = deque()
+        self.jobs_cond = threading.Condition()
+        self.affinity = {}
+        self.slots = [DriverSlot(i) for i in range(self.size)]
+        self.lock = threading.Lock()
+        self.started = False
+        # Jednocześnie rozgrzewamy tylko jedną przeglądarkę, żeby nie podwajać zużycia pamięci całej puli
+        self.warmup_lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.started:
+                return
+            self.started = True
+
+        for slot in self.slots:
+            threading.Thread(target=self._run, args=(slot,), daemon=True, name=f'driver-{slot.index}').start()
+
+    def submit(self, fn, *args, affinity=None):
+        # fn zostanie wywołane jako fn(*args, driver); wynik False traktujemy jak błąd zadania
+        future = Future()
+        with self.jobs_cond:
+            if affinity is None:
+                self.jobs.append((future, fn, args))
+            else:
+                self._affinity_slot(affinity).jobs.append((future, fn, args))
+            self.jobs_cond.notify_all()
+        return future
+
+    def pending(self):
+        with self.jobs_cond:
+            return len(self.jobs) + sum(len(slot.jobs) for slot in self.slots)
+
+    def _affinity_slot(self, key):
+        index = self.affinity.get(key)
+        if index is None:
+            counts = [0] * self.size
+            for assigned in self.affinity.values():
+                counts[assigned] += 1
+            index = counts.index(min(counts))
+            self.affinity[key] = index
+        return self.slots[index]
+
+    def _next_job(self, slot):
+        # Najpierw zadania przypisane do tej przeglądarki, potem wspólna kolejka
+        with self.jobs_cond:
+            while not slot.jobs and not self.jobs:
+                self.jobs_cond.wait()
+            return slot.jobs.popleft() if slot.jobs else self.jobs.popleft()
+
+    def health(self):
+        return [slot.health() for slot in self.slots]
+
+    def _start_driver(self, slot):
+        backoff = RESTART_BACKOFF_MIN
+        while True:
+            slot.status = 'starting'
+            try:
+                self._install(slot, self.create_driver())
+                slot.status = 'idle'
+                return
+            except Exception as e:
+                slot.driver = None
+                slot.status = 'down'
+                slot.last_error = str(e)
+                print(f"[driver-{slot.index}] Nie udało się uruchomić przeglądarki: {e} – ponowna próba za {backoff}s")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, RESTART_BACKOFF_MAX)
+
+    def _restart_driver(self, slot):
+        print(f"[driver-{slot.index}] Przeglądarka nie odpowiada – restart")
+        self._quit(slot.driver)
+        slot.driver = None
+        slot.restarts += 1
+        self._start_driver(slot)
+
+    def _install(self, slot, driver):
+        slot.driver = driver
+        slot.started_at = time.time()
+        slot.driver_captures = 0
+        slot.consecutive_errors = 0
+        slot.rss = None
+        slot.rss_checked_at = 0
+
+    def _recycle_reason(self, slot):
+        # Pamięć jest mierzona zawsze (dla /api/drivers i /metrics); limit działa tylko, gdy jest ustawiony
+        if time.time() - slot.rss_checked_at >= RSS_CHECK_INTERVAL:
+            slot.rss_checked_at = time.time()
+            slot.rss = tree_rss(driver_pid(slot.driver))
+
+        if self.max_errors and slot.consecutive_errors >= self.max_errors:
+            return f'{slot.consecutive_errors} błędy z rzędu'
+        if self.max_captures and slot.driver_captures >= self.max_captures:
+            return f'{slot.driver_captures} zrzutów'
+        if self.max_age and time.time() - slot.started_at >= self.max_age:
+            return 'wiek przeglądarki'
+
+        if self.max_rss and slot.rss is not None and slot.rss >= self.max_rss:
+            return f'{slot.rss / 2**20:.0f} MB pamięci'
+        return None
+
+    def _warm_replacement(self, slot):
+        try:
+            with self.warmup_lock:
+                slot.replacement = self.create_driver()
+        except Exception as e:
+            slot.last_error = str(e)
+            print(f"[driver-{slot.index}] Nie udało się uruchomić następcy: {e} – stara przeglądarka działa dalej")
+        finally:
+            slot.warming = False
+
+    def _swap_replacement(self, slot):
+        old = slot.driver
+        self._install(slot, slot.replacement)
+        slot.replacement = None
+        slot.recycles += 1
+        print(f"[driver-{slot.index}] Przeglądarka wymieniona ({slot.recycle_reason})")
+        # Zamykanie starej przeglądarki potrafi trwać – nie blokujemy nim zadań
+        threading.Thread(target=self._quit, args=(old,), daemon=True).start()
+
+    def _quit(self, driver):
+        if driver is None:
+            return
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def _is_alive(self, driver):
+        try:
+            driver.execute_script('return 1')
+            return True
+        except Exception:
+            return False
+
+    def _run(self, slot):
+        self._start_driver(slot)
+
+        while True:
+            future, fn, args = self._next_job(slot)
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            if slot.replacement is not None:
+                self._swap_replacement(slot)
+
+            slot.status = 'busy'
+            slot.last_job_at = time.time()
+            failed = False
+            try:
+                result = fn(*args, slot.driver)
+            except Exception as e:
+                failed = True
+                slot.last_error = str(e)
+                future.set_exception(e)
+            else:
+                failed = result is False
+                future.set_result(result)
+
+            if failed:
+                slot.errors += 1
+                slot.consecutive_errors += 1
+                if not self._is_alive(slot.driver):
+                    self._restart_driver(slot)
+            else:
+                slot.captures += 1
+                slot.driver_captures += 1
+                slot.consecutive_errors = 0
+
+            slot.status = 'idle'
+
+            if not slot.warming and slot.replacement is None:
+                reason = self._recycle_reason(slot)
+                if reason:
+                    print(f"[driver-{slot.index}] Wymiana przeglądarki: {reason} – uruchamiam następcę")
+                    slot.recycle_reason = reason
+                    slot.warming = True
+                    threading.Thread(target=self._warm_replacement, args=(slot,), daemon=True,
+                                     name=f'driver-{slot.index}-warmup').start()
+
+
+def driver_pid(driver):
+    # PID chromedrivera; Chrome i jego renderery są jego potomkami
+    process = getattr(getattr(driver, 'service', None), 'process', None)
+    return getattr(process, 'pid', None)
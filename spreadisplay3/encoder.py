@@ -0,0 +1,57 @@
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+
+# format -> (typ MIME, rozszerzenie pliku)
+FORMATS = {
+    'png': ('image/png', 'png'),
+    'webp': ('image/webp', 'webp'),
+    'jpeg': ('image/jpeg', 'jpg'),
+    'thumb': ('image/jpeg', 'thumb.jpg'),
+}
+
+
+class FrameEncoder:
+    """Koduje każdą klatkę raz do WebP/JPEG i miniatury, w osobnym wątku niż przechwytywanie."""
+
+    def __init__(self, formats, webp_quality=80, jpeg_quality=85, thumb_width=480, workers=1, observe=None):
+        self.formats = [f for f in formats if f in FORMATS and f != 'png']
+        self.webp_quality = webp_quality
+        self.jpeg_quality = jpeg_quality
+        self.thumb_width = thumb_width
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='encoder')
+        self.lock = threading.Lock()
+        # observe(sekundy) dostaje czas kodowania każdej klatki
+        self.observe = observe
+
+    def encode(self, frame):
+        # Klatka współdzielona przez kilka monitorów jest kodowana tylko raz
+        with self.lock:
+            future = frame.get('variants')
+            if future is None:
+                future = self.executor.submit(self._encode, frame['png'])
+                frame['variants'] = future
+            return future
+
+    def _encode(self, png):
+        started = time.perf_counter()
+        image = Image.open(io.BytesIO(png)).convert('RGB')
+        variants = {}
+
+        for fmt in self.formats:
+            buffer = io.BytesIO()
+            if fmt == 'webp':
+                image.save(buffer, 'WEBP', quality=self.webp_quality, method=4)
+            elif fmt == 'jpeg':
+                image.save(buffer, 'JPEG', quality=self.jpeg_quality, optimize=True)
+            elif fmt == 'thumb':
+                thumb = image.copy()
+                thumb.thumbnail((self.thumb_width, self.thumb_width), Image.LANCZOS)
+                thumb.save(buffer, 'JPEG', quality=self.jpeg_quality)
+            variants[fmt] = buffer.getvalue()
+
+        if self.observe:
+            self.observe(time.perf_counter() - started)
+        return variants
@@ -0,0 +1,82 @@
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+
+class EventBus:
+    """Wspólny bufor zdarzeń dla wszystkich subskrybentów.
+
+    Subskrybent nie ma własnej kolejki – pamięta tylko numer ostatniego zdarzenia
+    i czeka na wspólnym warunku, więc koszt jednego klienta to jeden licznik.
+    Numery zdarzeń są liczone w każdym procesie osobno, dlatego identyfikator
+    zdarzenia wysyłany klientowi zawiera też epokę procesu (`<epoka>.<numer>`).
+    """
+
+    def __init__(self, size=1000):
+        self.epoch = f"{os.getpid():x}-{int(time.time() * 1000):x}"
+        self.events = deque(maxlen=size)
+        self.cond = threading.Condition()
+        self.seq = itertools.count(1)
+        self.last_seq = 0
+
+    def publish(self, event_type, data):
+        with self.cond:
+            self.last_seq = next(self.seq)
+            self.events.append((self.last_seq, event_type, data))
+            self.cond.notify_all()
+
+    def parse_id(self, event_id):
+        """Numer zdarzenia z identyfikatora klienta albo None, gdy pochodzi z innego procesu lub jest błędny."""
+        epoch, _, seq = (event_id or '').partition('.')
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def wait(self, after, timeout):
+        deadline = time.time() + timeout
+        with self.cond:
+            while self.last_seq <= after:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return []
+                self.cond.wait(remaining)
+            events = []
+            for event in reversed(self.events):
+                if event[0] <= after:
+                    break
+                events.append(event)
+            events.reverse()
+            return events
+
+
+def format_sse(bus, seq, event_type, data):
+    return f"id: {bus.epoch}.{seq}\nevent: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+
+def sse_stream(bus, last_event_id, accept=None, heartbeat=15, reset_data=None, on_heartbeat=None):
+    # Klient bez Last-Event-ID, ze starszym niż bufor albo z innego procesu dostaje zdarzenie "reset";
+    # reset_data() dokłada do niego bieżący stan, bo zdarzeń sprzed połączenia klient już nie zobaczy.
+    # on_heartbeat() jest wywoływane po połączeniu i potem co heartbeat sekund, dopóki klient słucha
+    yield "retry: 3000\n\n"
+    last_id = bus.parse_id(last_event_id)
+    if last_id is None or (bus.events and last_id < bus.events[0][0] - 1) or last_id > bus.last_seq:
+        last_id = bus.last_seq
+        yield format_sse(bus, last_id, 'reset', reset_data() if reset_data else {})
+
+    heartbeat_at = 0
+    while True:
+        now = time.time()
+        if on_heartbeat and now - heartbeat_at >= heartbeat:
+            on_heartbeat()
+            heartbeat_at = now
+        events = bus.wait(last_id, heartbeat)
+        if not events:
+            yield ": ping\n\n"
+            continue
+        for seq, event_type, data in events:
+            last_id = seq
+            if accept is None or accept(event_type, data):
+                yield format_sse(bus, seq, event_type, data)
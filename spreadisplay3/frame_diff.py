@@ -0,0 +1,37 @@
+import io
+from PIL import Image, ImageChops
+
+# Porównujemy zmniejszone klatki w RGB: jeden piksel to średnia bloku ok. 12x11 px
+SIGNATURE_SIZE = (160, 90)
+PIXEL_THRESHOLD = 4
+
+
+def decode(png):
+    return Image.open(io.BytesIO(png)).convert('RGB')
+
+
+def signature(png):
+    return decode(png).resize(SIGNATURE_SIZE, Image.BOX)
+
+
+def signature_from_file(path):
+    with open(path, 'rb') as f:
+        return signature(f.read())
+
+
+def changed_ratio(previous, current, pixel_threshold=PIXEL_THRESHOLD):
+    """Odsetek pikseli, w których któryś kanał zmienił się o więcej niż pixel_threshold."""
+    if previous is None or previous.size != current.size or previous.mode != current.mode:
+        return 1.0
+
+    # Bierzemy największą różnicę z kanałów R, G, B – zmiana koloru przy tej samej jasności też się liczy
+    red, green, blue = ImageChops.difference(previous, current).split()
+    diff = ImageChops.lighter(ImageChops.lighter(red, green), blue)
+    mask = diff.point(lambda value: 255 if value > pixel_threshold else 0)
+    changed = mask.histogram()[255]
+    return changed / (current.size[0] * current.size[1])
+
+
+def exact_changed_ratio(previous_png, current_png):
+    """Odsetek pikseli pełnej klatki, które różnią się czymkolwiek."""
+    return changed_ratio(decode(previous_png), decode(current_png), pixel_threshold=0)
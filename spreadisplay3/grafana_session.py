@@ -0,0 +1,107 @@
+import threading
+import time
+import weakref
+
+
+class SessionCache:
+    """Jedna sesja Grafany współdzielona przez wszystkie przeglądarki w puli.
+
+    Logowanie formularzem odbywa się raz, na przeglądarce, która pierwsza potrzebuje
+    sesji. Ciasteczka są potem wstrzykiwane (CDP Network.setCookies) do każdej
+    przeglądarki przed nawigacją i odświeżane, zanim wygasną. Nowe wartości ciasteczek
+    ustawione przez Grafanę (rotacja tokenu) są przejmowane po każdym zrzucie.
+    """
+
+    def __init__(self, login, max_age=3600, refresh_before=300):
+        self.login = login
+        self.max_age = max_age
+        self.refresh_before = refresh_before
+        self.lock = threading.Lock()
+        self.cookies = None
+        self.generation = 0
+        self.logged_in_at = None
+        self.expires_at = None
+        self.logins = 0
+        self.applied = weakref.WeakKeyDictionary()
+
+    def apply(self, driver):
+        """Zapewnia, że przeglądarka ma aktualną sesję. Zwraca False, gdy logowanie się nie powiodło."""
+        with self.lock:
+            if self.cookies is None or time.time() > self.expires_at - self.refresh_before:
+                if not self._login(driver):
+                    return False
+            elif self.applied.get(driver) != self.generation:
+                self._inject(driver)
+            return True
+
+    def renew(self, driver):
+        # Grafana mimo wszystko przekierowała do logowania – sesja jest nieważna
+        with self.lock:
+            if self.applied.get(driver) == self.generation:
+                return self._login(driver)
+            # Inna przeglądarka zdążyła już zalogować się ponownie
+            self._inject(driver)
+            return True
+
+    def update_from(self, driver):
+        with self.lock:
+            if self.cookies is None or self.applied.get(driver) != self.generation:
+                return
+            known = {(cookie['name'], cookie.get('domain')) for cookie in self.cookies}
+            current = {(cookie['name'], cookie.get('domain')): cookie
+                       for cookie in driver.get_cookies()
+                       if (cookie['name'], cookie.get('domain')) in known}
+            if not current:
+                return
+            cookies = [current.get((cookie['name'], cookie.get('domain')), cookie) for cookie in self.cookies]
+            if cookies != self.cookies:
+                self._store(cookies)
+                self.applied[driver] = self.generation
+
+    def status(self):
+        with self.lock:
+            return {
+                'logged_in': self.cookies is not None,
+                'logged_in_at': self.logged_in_at,
+                'expires_at': self.expires_at,
+                'logins': self.logins,
+            }
+
+    def _login(self, driver):
+        # Formularz logowania pokazuje się tylko bez ważnej sesji, więc czyścimy stare ciasteczka
+        driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+        if not self.login(driver):
+            self.cookies = None
+            return False
+
+        self.logins += 1
+        self.logged_in_at = time.time()
+        self._store(driver.get_cookies())
+        self.applied[driver] = self.generation
+        return True
+
+    def _store(self, cookies):
+        self.cookies = cookies
+        self.generation += 1
+        # Ciasteczka sesyjne nie mają terminu – wtedy obowiązuje max_age od zalogowania
+        expiries = [cookie['expiry'] for cookie in cookies if cookie.get('expiry')]
+        self.expires_at = min(expiries) if expiries else self.logged_in_at + self.max_age
+
+    def _inject(self, driver):
+        params = []
+        for cookie in self.cookies:
+            param = {
+                'name': cookie['name'],
+                'value': cookie['value'],
+                'domain': cookie.get('domain'),
+                'path': cookie.get('path', '/'),
+                'secure': cookie.get('secure', False),
+                'httpOnly': cookie.get('httpOnly', False),
+            }
+            if cookie.get('expiry'):
+                param['expires'] = cookie['expiry']
+            if cookie.get('sameSite'):
+                param['sameSite'] = cookie['sameSite']
+            params.append(param)
+        driver.execute_cdp_cmd('Network.setCookies', {'cookies': params})
+        self.applied[driver] = self.generation
@@ -0,0 +1,99 @@
+import os
+import shutil
+import tempfile
+import threading
+
+HISTORY_DIR = 'history'
+
+
+class SnapshotHistory:
+    """Ostatnie klatki każdego monitora: `history/<tv_id>/<znacznik czasu w ms>.<rozszerzenie>`.
+
+    Nazwa pliku jest jednocześnie indeksem po czasie, więc procesy WWW widzą klatki
+    zapisane przez proces przechwytywania bez osobnego pliku indeksu. Najstarsze
+    klatki są usuwane, gdy monitor ma ich więcej niż max_frames albo zajmują
+    więcej niż max_bytes.
+    """
+
+    def __init__(self, directory, max_frames=120, max_bytes=50 * 2**20):
+        self.directory = os.path.abspath(os.path.join(directory, HISTORY_DIR))
+        self.max_frames = max_frames
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def add(self, tv_id, timestamp, data, ext):
+        if self.max_frames <= 0:
+            return
+        directory = self._monitor_dir(tv_id)
+        with self.lock:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, os.path.join(directory, f"{int(timestamp * 1000)}.{ext}"))
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            self._evict(tv_id)
+
+    def frames(self, tv_id, since=None, until=None):
+        """Klatki monitora od najstarszej: słowniki z kluczami at, name, size."""
+        directory = self._monitor_dir(tv_id)
+        try:
+            entries = list(os.scandir(directory))
+        except FileNotFoundError:
+            return []
+
+        frames = []
+        for entry in entries:
+            stamp, _, ext = entry.name.partition('.')
+            if not stamp.isdigit() or ext.endswith('tmp'):
+                continue
+            at = int(stamp) / 1000
+            if (since is not None and at < since) or (until is not None and at > until):
+                continue
+            try:
+                size = entry.stat().st_size
+            except FileNotFoundError:
+                continue
+            frames.append({'at': at, 'name': entry.name, 'size': size})
+        frames.sort(key=lambda frame: frame['at'])
+        return frames
+
+    def frame_at(self, tv_id, at):
+        # Klatka, która była wyświetlana w chwili `at` – ostatnia zapisana nie później niż `at`
+        frames = self.frames(tv_id, until=at)
+        if not frames:
+            return None
+        frame = frames[-1]
+        frame['path'] = os.path.join(self._monitor_dir(tv_id), frame['name'])
+        return frame
+
+    def rename(self, old_id, new_id):
+        with self.lock:
+            old_dir = self._monitor_dir(old_id)
+            if os.path.isdir(old_dir):
+                shutil.rmtree(self._monitor_dir(new_id), ignore_errors=True)
+                os.replace(old_dir, self._monitor_dir(new_id))
+
+    def delete(self, tv_id):
+        with self.lock:
+            shutil.rmtree(self._monitor_dir(tv_id), ignore_errors=True)
+
+    def _monitor_dir(self, tv_id):
+        return os.path.join(self.directory, tv_id)
+
+    def _evict(self, tv_id):
+        frames = self.frames(tv_id)
+        total = sum(frame['size'] for frame in frames)
+        # Najnowsza klatka zostaje zawsze, nawet jeśli sama przekracza limit rozmiaru
+        while len(frames) > 1 and (len(frames) > self.max_frames or (self.max_bytes and total > self.max_bytes)):
+            frame = frames.pop(0)
+            total -= frame['size']
+            try:
+                os.remove(os.path.join(self._monitor_dir(tv_id), frame['name']))
+            except FileNotFoundError:
+                pass
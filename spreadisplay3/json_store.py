@@ -0,0 +1,155 @@
+import copy
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows – zostaje tylko blokada między wątkami
+    fcntl = None
+
+
+class JsonStore:
+    """Plik JSON współdzielony przez cały proces.
+
+    Odczyt zwraca kopię sparsowanej zawartości z pamięci i parsuje plik ponownie
+    tylko wtedy, gdy zmienił się jego mtime/rozmiar/inode. Zapisy są serializowane
+    (wątki i – gdzie jest fcntl – procesy) i podmieniają plik atomowo.
+
+    Przy versioned=True każda zmiana zawartości zwiększa `version`. Licznik jest
+    zapisywany obok pliku (`<plik>.version`, razem ze skrótem zawartości), więc
+    wszystkie procesy widzą ten sam, rosnący numer – także po ręcznej edycji pliku.
+    """
+
+    def __init__(self, path, default=None, versioned=False):
+        self.path = path
+        self.default = default if default is not None else {}
+        self.versioned = versioned
+        self.lock = threading.RLock()
+        self.data = None
+        self.digest = None
+        self.stat = None
+        self.counter_path = path + '.version'
+        self.counter = None
+        self.counter_stat = None
+
+    @property
+    def version(self):
+        with self.lock:
+            self._reload_if_changed()
+            counter = self._read_counter()
+            if counter['digest'] != self.digest:
+                # Plik zmieniono bez podbicia licznika (np. ręcznie) – podbijamy go pod blokadą
+                with self._exclusive():
+                    self._reload_if_changed()
+                    counter = self._bump_counter()
+            return counter['version']
+
+    def read(self):
+        with self.lock:
+            self._reload_if_changed()
+            return copy.deepcopy(self.data)
+
+    def write(self, data):
+        with self._exclusive():
+            self._write(data)
+
+    @contextmanager
+    def edit(self):
+        # Odczyt-modyfikacja-zapis pod blokadą; plik zapisywany tylko, gdy coś się zmieniło
+        with self._exclusive():
+            self._reload_if_changed()
+            data = copy.deepcopy(self.data)
+            yield data
+            if data != self.data:
+                self._write(data)
+
+    @contextmanager
+    def _exclusive(self):
+        with self.lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.path + '.lock', 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _reload_if_changed(self):
+        stat = self._stat()
+        if self.data is not None and stat == self.stat:
+            return
+
+        if stat is None:
+            data = copy.deepcopy(self.default)
+        else:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+
+        if data != self.data:
+            self.digest = content_digest(data)
+        self.data = data
+        self.stat = stat
+
+    def _write(self, data):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(self.path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        if data != self.data:
+            self.digest = content_digest(data)
+        self.data = copy.deepcopy(data)
+        self.stat = self._stat()
+        if self.versioned:
+            self._bump_counter()
+
+    def _read_counter(self):
+        try:
+            stat = os.stat(self.counter_path)
+        except FileNotFoundError:
+            return {'version': 0, 'digest': None}
+        stat = stat.st_mtime_ns, stat.st_size, stat.st_ino
+        if stat != self.counter_stat:
+            try:
+                with open(self.counter_path, 'r') as f:
+                    self.counter = json.load(f)
+            except (OSError, ValueError):
+                return {'version': 0, 'digest': None}
+            self.counter_stat = stat
+        return self.counter
+
+    def _bump_counter(self):
+        # Wywoływane pod blokadą pliku; licznik rośnie tylko wtedy, gdy zawartość jest inna niż przy ostatnim podbiciu
+        counter = self._read_counter()
+        if counter['digest'] == self.digest:
+            return counter
+        counter = {'version': counter['version'] + 1, 'digest': self.digest}
+        directory = os.path.dirname(os.path.abspath(self.counter_path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(self.counter_path), suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(counter, f)
+        os.replace(tmp_path, self.counter_path)
+        return counter
+
+
+def content_digest(data):
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()
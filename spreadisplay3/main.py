@@ -1,7 +1,10 @@
+import os
 import threading
 from app import app, snapshot_worker
 
 if __name__ == '__main__':
-    # Start the snapshot worker in a background thread
-    threading.Thread(target=snapshot_worker, daemon=True).start()
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    # Serwer deweloperski; w produkcji: python serve.py (gunicorn + osobny proces przechwytywania)
+    # Z reloaderem wątek przechwytywania startuje tylko w procesie potomnym, który obsługuje żądania
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        threading.Thread(target=snapshot_worker, daemon=True).start()
+    app.run(host='0.0.0.0', port=5000, debug=True)
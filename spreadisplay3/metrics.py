@@ -0,0 +1,178 @@
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from json_store import JsonStore
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+METRICS_DIR = 'metrics'
+# Suma liczników procesów, które już nie żyją – bez niej sumy spadałyby po restarcie workera
+RETIRED_FILE = 'retired.json'
+
+
+class Registry:
+    """Liczniki i histogramy w formacie Prometheusa, bez zewnętrznych zależności.
+
+    Każdy proces (workery WWW, proces przechwytywania) ma własny rejestr i co jakiś
+    czas zrzuca go do `snapshots/metrics/<pid>.json`; /metrics sumuje zrzuty
+    wszystkich żyjących procesów i `retired.json`, do którego trafiają zrzuty
+    procesów zakończonych.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+
+    def counter(self, name, help_text):
+        self._declare(name, 'counter', help_text)
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self._declare(name, 'histogram', help_text, list(buckets))
+
+    def inc(self, name, amount=1, **labels):
+        key = label_key(labels)
+        with self.lock:
+            series = self.metrics[name]['series']
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = label_key(labels)
+        with self.lock:
+            metric = self.metrics[name]
+            series = metric['series'].get(key)
+            if series is None:
+                # liczniki kubełków, potem suma i liczba obserwacji
+                series = metric['series'][key] = [0] * len(metric['buckets']) + [0.0, 0]
+            for index, bound in enumerate(metric['buckets']):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def timer(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def state(self):
+        with self.lock:
+            return json.loads(json.dumps(self.metrics))
+
+    def dump(self, directory):
+        directory = os.path.join(directory, METRICS_DIR)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.', suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.state(), f)
+        os.replace(tmp_path, os.path.join(directory, f'{os.getpid()}.json'))
+
+    def collect(self, directory):
+        """Stan wszystkich procesów: własny z pamięci, pozostałe z ich zrzutów."""
+        states = [self.state()]
+        retired = JsonStore(os.path.join(directory, METRICS_DIR, RETIRED_FILE))
+        for path in glob.glob(os.path.join(directory, METRICS_DIR, '*.json')):
+            name = os.path.basename(path).split('.')[0]
+            if not name.isdigit() or int(name) == os.getpid():
+                continue
+            if not pid_alive(int(name)):
+                retire(retired, path)
+                continue
+            try:
+                with open(path, 'r') as f:
+                    states.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        states.append(retired.read())
+        return merge(states)
+
+    def _declare(self, name, kind, help_text, buckets=None):
+        with self.lock:
+            self.metrics.setdefault(name, {'type': kind, 'help': help_text, 'buckets': buckets, 'series': {}})
+
+
+def label_key(labels):
+    return json.dumps(sorted(labels.items()))
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def retire(retired, path):
+    # Zrzut zakończonego procesu jest doliczany do retired.json i dopiero potem usuwany;
+    # pod blokadą pliku, więc dwa procesy nie doliczą tego samego zrzutu dwa razy
+    with retired.edit() as data:
+        try:
+            with open(path, 'r') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError):
+            state = {}
+        merged = merge([data, state])
+        data.clear()
+        data.update(merged)
+        os.remove(path)
+
+
+def merge(states):
+    merged = {}
+    for state in states:
+        for name, metric in state.items():
+            target = merged.setdefault(name, dict(metric, series={}))
+            for key, value in metric['series'].items():
+                current = target['series'].get(key)
+                if current is None:
+                    target['series'][key] = value
+                elif isinstance(value, list):
+                    target['series'][key] = [a + b for a, b in zip(current, value)]
+                else:
+                    target['series'][key] = current + value
+    return merged
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + '}'
+
+
+def render(prefix, metrics, gauges=()):
+    """Tekst w formacie ekspozycji Prometheusa; gauges to krotki (nazwa, opis, [(etykiety, wartość)])."""
+    lines = []
+    for name, metric in sorted(metrics.items()):
+        full_name = f'{prefix}_{name}'
+        lines.append(f'# HELP {full_name} {metric["help"]}')
+        lines.append(f'# TYPE {full_name} {metric["type"]}')
+        for key, value in sorted(metric['series'].items()):
+            labels = [tuple(pair) for pair in json.loads(key)]
+            if metric['type'] == 'histogram':
+                for bound, count in zip(metric['buckets'], value):
+                    lines.append(f'{full_name}_bucket{format_labels(labels + [("le", bound)])} {count}')
+                lines.append(f'{full_name}_bucket{format_labels(labels + [("le", "+Inf")])} {value[-1]}')
+                lines.append(f'{full_name}_sum{format_labels(labels)} {value[-2]}')
+                lines.append(f'{full_name}_count{format_labels(labels)} {value[-1]}')
+            else:
+                lines.append(f'{full_name}{format_labels(labels)} {value}')
+
+    for name, help_text, samples in gauges:
+        full_name = f'{prefix}_{name}'
+        lines.append(f'# HELP {full_name} {help_text}')
+        lines.append(f'# TYPE {full_name} gauge')
+        for labels, value in samples:
+            lines.append(f'{full_name}{format_labels(sorted(labels.items()))} {value}')
+    return '\n'.join(lines) + '\n'
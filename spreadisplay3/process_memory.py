@@ -0,0 +1,68 @@
+import os
+
+try:
+    import psutil
+except ImportError:  # bez psutil czytamy /proc (Linux)
+    psutil = None
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def tree_rss(pid):
+    """Suma RSS procesu i wszystkich jego potomków w bajtach (chromedriver + Chrome z rendererami).
+
+    Zwraca None, gdy pamięci nie da się odczytać.
+    """
+    if pid is None:
+        return None
+    if psutil is not None:
+        return _tree_rss_psutil(pid)
+    if os.path.isdir('/proc'):
+        return _tree_rss_proc(pid)
+    return None
+
+
+def _tree_rss_psutil(pid):
+    try:
+        root = psutil.Process(pid)
+        processes = [root] + root.children(recursive=True)
+    except psutil.Error:
+        return None
+
+    total = 0
+    for process in processes:
+        try:
+            total += process.memory_info().rss
+        except psutil.Error:
+            pass
+    return total
+
+
+def _tree_rss_proc(pid):
+    children = {}
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f'/proc/{name}/stat', 'r') as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # Nazwa procesu w nawiasach może zawierać spacje – pola liczymy od ostatniego ')'
+        ppid = int(stat[stat.rfind(')') + 2:].split()[1])
+        children.setdefault(ppid, []).append(int(name))
+
+    if not os.path.exists(f'/proc/{pid}'):
+        return None
+
+    total = 0
+    stack = [pid]
+    while stack:
+        current = stack.pop()
+        stack.extend(children.get(current, []))
+        try:
+            with open(f'/proc/{current}/statm', 'r') as f:
+                total += int(f.read().split()[1]) * PAGE_SIZE
+        except OSError:
+            pass
+    return total
@@ -0,0 +1,126 @@
+import json
+import time
+
+POLL_INTERVAL = 0.1
+NETWORK_IDLE_MS = 500
+# Długie połączenia (long-poll, strumienie) nie mogą blokować gotowości w nieskończoność
+LONG_REQUEST_SECONDS = 10
+
+# Gotowe predykaty JS, do użycia przez nazwę w ustawieniach monitora ("ready": "grafana")
+PREDICATES = {
+    'grafana': (
+        "return document.querySelectorAll('.react-grid-item').length > 0"
+        " && document.querySelectorAll('[aria-label=\"Panel loading bar\"], .panel-loading').length === 0;"
+    ),
+}
+
+
+def drain_network_log(driver):
+    try:
+        driver.get_log('performance')
+    except Exception:
+        pass
+
+
+def _network_events(driver):
+    try:
+        entries = driver.get_log('performance')
+    except Exception:
+        return None
+
+    events = []
+    for entry in entries:
+        try:
+            message = json.loads(entry['message'])['message']
+        except (KeyError, ValueError):
+            continue
+        if message.get('method', '').startswith('Network.'):
+            events.append(message)
+    return events
+
+
+def _wait_for(predicate, deadline):
+    while time.time() < deadline:
+        try:
+            if predicate():
+                return True
+        except Exception:
+            pass
+        time.sleep(POLL_INTERVAL)
+    return False
+
+
+def wait_for_network_idle(driver, deadline, idle_ms=NETWORK_IDLE_MS):
+    # Zdarzenia CDP Network.* z logu "performance" (goog:loggingPrefs w opcjach Chrome)
+    inflight = {}
+    idle_since = time.time()
+
+    while time.time() < deadline:
+        events = _network_events(driver)
+        if events is None:
+            return False
+
+        now = time.time()
+        for event in events:
+            params = event.get('params', {})
+            request_id = params.get('requestId')
+            method = event['method']
+            if method == 'Network.requestWillBeSent':
+                inflight[request_id] = now
+            elif method in ('Network.loadingFinished', 'Network.loadingFailed'):
+                inflight.pop(request_id, None)
+
+        for request_id, started in list(inflight.items()):
+            if now - started > LONG_REQUEST_SECONDS:
+                del inflight[request_id]
+
+        if inflight:
+            idle_since = now
+        elif (now - idle_since) * 1000 >= idle_ms:
+            return True
+
+        time.sleep(POLL_INTERVAL)
+    return False
+
+
+def wait_until_ready(driver, settings, timeout):
+    """Czeka na kolejne sygnały gotowości strony; zwraca (gotowa, ostatni spełniony sygnał)."""
+    deadline = time.time() + timeout
+    signal = None
+
+    if not _wait_for(lambda: driver.execute_script('return document.readyState') == 'complete', deadline):
+        return False, signal
+    signal = 'document'
+
+    if settings.get('network_idle', True):
+        if not wait_for_network_idle(driver, deadline, settings.get('network_idle_ms', NETWORK_IDLE_MS)):
+            return False, signal
+        signal = 'network'
+
+    selector = settings.get('selector')
+    if selector:
+        if not _wait_for(lambda: driver.execute_script(
+                'return document.querySelector(arguments[0]) !== null', selector), deadline):
+            return False, signal
+        signal = 'selector'
+
+    script = settings.get('ready')
+    if script:
+        script = PREDICATES.get(script, script)
+        if not _wait_for(lambda: driver.execute_script(script), deadline):
+            return False, signal
+        signal = 'script'
+
+    return True, signal
+
+
+def wait_for_script(driver, settings, timeout):
+    # Dla już załadowanej strony (tryb kart) sprawdzamy tylko predykat, np. czy panele skończyły odświeżanie
+    script = settings.get('ready')
+    if not script:
+        return True, None
+    script = PREDICATES.get(script, script)
+    deadline = time.time() + timeout
+    if not _wait_for(lambda: driver.execute_script(script), deadline):
+        return False, None
+    return True, 'script'
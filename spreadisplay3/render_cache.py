@@ -0,0 +1,90 @@
+import threading
+import time
+from concurrent.futures import Future
+
+
+def capture_key(url, settings):
+    # Ten sam URL w tym samym rozmiarze, z tym samym logowaniem i backendem renderujemy tylko raz
+    return (
+        settings.get('backend', 'selenium'),
+        url,
+        int(settings.get('width', 1920)),
+        int(settings.get('height', 1020)),
+        settings.get('login', 'grafana'),
+    )
+
+
+class RenderCache:
+    """Wspólny cache renderów: równoległe żądania o ten sam klucz czekają na jeden render,
+    a świeży wynik (młodszy niż max_age) jest zwracany bez ponownego renderowania.
+
+    Żądanie z max_age=0 („zrób zrzut teraz”) nie dołącza do renderu, który już trwa,
+    bo ten zaczął się przed żądaniem – czeka na nowy render uruchomiony zaraz po nim."""
+
+    def __init__(self, keep_for=600):
+        self.keep_for = keep_for
+        self.lock = threading.Lock()
+        self.inflight = {}
+        self.queued = {}
+        self.frames = {}
+
+    def get(self, key, max_age, render):
+        with self.lock:
+            future = self.inflight.get(key)
+            if future is not None and max_age > 0:
+                return future, True
+            if future is not None:
+                queued = self.queued.get(key)
+                if queued is not None:
+                    return queued[0], True
+                queued = Future()
+                self.queued[key] = (queued, render)
+                return queued, False
+
+            now = time.time()
+            self._purge(now)
+            frame = self.frames.get(key)
+            if frame is not None and now - frame['rendered_at'] < max_age:
+                future = Future()
+                future.set_result(frame)
+                return future, True
+
+            future = render()
+            self.inflight[key] = future
+
+        future.add_done_callback(lambda f: self._on_done(key, f))
+        return future, False
+
+    def _purge(self, now):
+        for key, frame in list(self.frames.items()):
+            if now - frame['rendered_at'] > self.keep_for:
+                del self.frames[key]
+
+    def _on_done(self, key, future):
+        with self.lock:
+            self.inflight.pop(key, None)
+            if not future.cancelled() and future.exception() is None and future.result():
+                self.frames[key] = future.result()
+
+            queued = self.queued.pop(key, None)
+            if queued is None:
+                return
+            waiting, render = queued
+            try:
+                rendered = render()
+            except Exception as e:
+                waiting.set_exception(e)
+                return
+            self.inflight[key] = rendered
+
+        rendered.add_done_callback(lambda f: self._on_done(key, f))
+        rendered.add_done_callback(lambda f: chain(f, waiting))
+
+
+def chain(source, target):
+    if source.cancelled():
+        target.cancel()
+    elif source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
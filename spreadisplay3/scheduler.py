@@ -0,0 +1,190 @@
+import heapq
+import itertools
+import threading
+import time
+
+CONFIG_POLL_INTERVAL = 5
+URGENT_PRIORITY = 1 << 30
+
+
+class Scheduler:
+    """Harmonogram zrzutów: każdy monitor ma własny termin, interwał i priorytet.
+
+    Terminy czekają w kopcu `timers`; gdy termin minie, monitor przechodzi do kopca
+    `ready` uporządkowanego po priorytecie. Do puli trafia najwyżej `max_inflight`
+    zadań naraz, więc przy zatorze pierwszeństwo mają monitory o wyższym priorytecie.
+    Monitory o tym samym kluczu renderu (`capture_key`) liczą się jako jedno zadanie.
+    """
+
+    def __init__(self, load_monitors, submit, max_inflight, default_interval, should_capture=None,
+                 capture_key=None):
+        self.load_monitors = load_monitors
+        self.submit = submit
+        self.max_inflight = max(1, max_inflight)
+        self.default_interval = default_interval
+        self.should_capture = should_capture
+        self.capture_key = capture_key or (lambda url, settings: url)
+
+        self.cond = threading.Condition()
+        self.seq = itertools.count()
+        self.monitors = {}
+        self.timers = []
+        self.ready = []
+        self.entries = {}
+        self.inflight = {}
+        self.capture_after = set()
+        # Monitory, którym URL albo ustawienia zmieniły się w trakcie zrzutu – po jego zakończeniu idą do kolejki od razu
+        self.changed_inflight = set()
+        self.forced = set()
+        self.next_deadline = {}
+        self.config_loaded_at = 0
+
+    def interval(self, tv_id):
+        _, settings = self.monitors[tv_id]
+        return float(settings.get('interval', self.default_interval))
+
+    def priority(self, tv_id):
+        _, settings = self.monitors[tv_id]
+        return int(settings.get('priority', 0))
+
+    def capture_now(self, tv_id):
+        with self.cond:
+            if tv_id not in self.monitors:
+                self._sync_monitors()
+            if tv_id not in self.monitors:
+                return False
+            self.forced.add(tv_id)
+            if tv_id in self.inflight:
+                self.capture_after.add(tv_id)
+            else:
+                self._push_ready(tv_id, URGENT_PRIORITY)
+            self.cond.notify()
+            return True
+
+    def next_capture(self, tv_id):
+        with self.cond:
+            if tv_id in self.inflight:
+                return time.time()
+            return self.next_deadline.get(tv_id)
+
+    def status(self):
+        with self.cond:
+            return {
+                tv_id: {
+                    'interval': self.interval(tv_id),
+                    'priority': self.priority(tv_id),
+                    'next_capture': self.next_deadline.get(tv_id),
+                    'in_progress': tv_id in self.inflight,
+                }
+                for tv_id in self.monitors
+            }
+
+    def _schedule(self, tv_id, deadline):
+        seq = next(self.seq)
+        self.entries[tv_id] = seq
+        self.next_deadline[tv_id] = deadline
+        heapq.heappush(self.timers, (deadline, seq, tv_id))
+
+    def _push_ready(self, tv_id, priority):
+        seq = next(self.seq)
+        self.entries[tv_id] = seq
+        self.next_deadline[tv_id] = time.time()
+        heapq.heappush(self.ready, (-priority, seq, tv_id))
+
+    def _sync_monitors(self):
+        monitors = self.load_monitors()
+        now = time.time()
+
+        for tv_id in list(self.monitors):
+            if tv_id not in monitors:
+                del self.monitors[tv_id]
+                self.changed_inflight.discard(tv_id)
+                self.entries.pop(tv_id, None)
+                self.next_deadline.pop(tv_id, None)
+
+        for tv_id, monitor in monitors.items():
+            previous = self.monitors.get(tv_id)
+            self.monitors[tv_id] = monitor
+            if tv_id in self.inflight:
+                # Trwający zrzut użył starych ustawień – zapamiętujemy zmianę, _on_done wstawi monitor do kolejki
+                if previous is not None and previous != monitor:
+                    self.changed_inflight.add(tv_id)
+                continue
+            if previous is None or previous[0] != monitor[0]:
+                # Nowy monitor albo zmieniony URL – zrzut od razu
+                self._schedule(tv_id, now)
+            elif previous[1] != monitor[1]:
+                self._schedule(tv_id, min(self.next_deadline.get(tv_id, now), now + self.interval(tv_id)))
+
+        self.config_loaded_at = now
+
+    def _promote_due(self, now):
+        while self.timers and self.timers[0][0] <= now:
+            _, seq, tv_id = heapq.heappop(self.timers)
+            if self.entries.get(tv_id) != seq:
+                continue
+            self._push_ready(tv_id, self.priority(tv_id))
+
+    def _key(self, tv_id):
+        url, settings = self.monitors[tv_id]
+        return self.capture_key(url, settings)
+
+    def _pop_ready(self):
+        while self.ready:
+            _, seq, tv_id = self.ready[0]
+            if self.entries.get(tv_id) != seq:
+                heapq.heappop(self.ready)
+                continue
+
+            keys = set(self.inflight.values())
+            if len(keys) >= self.max_inflight and self._key(tv_id) not in keys:
+                return None
+
+            heapq.heappop(self.ready)
+            del self.entries[tv_id]
+            return tv_id
+        return None
+
+    def _on_done(self, tv_id):
+        with self.cond:
+            self.inflight.pop(tv_id, None)
+            if tv_id in self.monitors:
+                changed = tv_id in self.changed_inflight
+                self.changed_inflight.discard(tv_id)
+                if tv_id in self.capture_after:
+                    self.capture_after.discard(tv_id)
+                    self._push_ready(tv_id, URGENT_PRIORITY)
+                elif changed:
+                    self._schedule(tv_id, time.time())
+                else:
+                    self._schedule(tv_id, time.time() + self.interval(tv_id))
+            self.cond.notify()
+
+    def run(self):
+        while True:
+            with self.cond:
+                now = time.time()
+                if now - self.config_loaded_at >= CONFIG_POLL_INTERVAL:
+                    self._sync_monitors()
+                self._promote_due(now)
+
+                tv_id = self._pop_ready()
+                if tv_id is None:
+                    timeout = CONFIG_POLL_INTERVAL
+                    if self.timers:
+                        timeout = min(timeout, max(0, self.timers[0][0] - now))
+                    self.cond.wait(timeout)
+                    continue
+
+                url, settings = self.monitors[tv_id]
+                forced = tv_id in self.forced
+                self.forced.discard(tv_id)
+                if not forced and self.should_capture and not self.should_capture(tv_id, settings):
+                    # Nikt nie ogląda monitora – przesuwamy termin bez robienia zrzutu
+                    self._schedule(tv_id, now + self.interval(tv_id))
+                    continue
+
+                self.inflight[tv_id] = self._key(tv_id)
+
+            future = self.submit(tv_id, url, settings, forced)
+            future.add_done_callback(lambda _, tv_id=tv_id: self._on_done(tv_id))
@@ -0,0 +1,71 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from gunicorn.app.base import BaseApplication
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+WEB_BIND = os.getenv('WEB_BIND', '0.0.0.0:5000')
+WEB_WORKERS = int(os.getenv('WEB_WORKERS', '2'))
+WEB_CONNECTIONS = int(os.getenv('WEB_CONNECTIONS', '1000'))
+CAPTURE_RESTART_DELAY = 5
+
+capture_process = None
+stopping = threading.Event()
+
+
+def supervise_capture():
+    # Jeden proces przechwytywania na cały serwer; po awarii (np. Chrome) uruchamiamy go ponownie
+    global capture_process
+    while not stopping.is_set():
+        capture_process = subprocess.Popen([sys.executable, os.path.join(BASE_DIR, 'capture_worker.py')], cwd=BASE_DIR)
+        code = capture_process.wait()
+        if stopping.is_set():
+            break
+        print(f"❌ Proces przechwytywania zakończył się (kod {code}), ponowne uruchomienie za {CAPTURE_RESTART_DELAY} s")
+        time.sleep(CAPTURE_RESTART_DELAY)
+
+
+def on_starting(server):
+    threading.Thread(target=supervise_capture, daemon=True, name='capture-supervisor').start()
+
+
+def on_exit(server):
+    stopping.set()
+    if capture_process and capture_process.poll() is None:
+        capture_process.terminate()
+        try:
+            capture_process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            capture_process.kill()
+
+
+class DisplayServer(BaseApplication):
+    """Serwer produkcyjny: gunicorn z workerami gevent (długie połączenia /api/events)."""
+
+    def load_config(self):
+        config = {
+            'bind': WEB_BIND,
+            'workers': WEB_WORKERS,
+            'worker_class': 'gevent',
+            'worker_connections': WEB_CONNECTIONS,
+            'timeout': 60,
+            'on_starting': on_starting,
+            'on_exit': on_exit,
+        }
+        for key, value in config.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        # Aplikacja ładowana osobno w każdym workerze, już po monkey-patchingu gevent
+        from app import app
+        return app
+
+
+if __name__ == '__main__':
+    os.chdir(BASE_DIR)
+    sys.path.insert(0, BASE_DIR)
+    DisplayServer().run()
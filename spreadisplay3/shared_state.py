@@ -0,0 +1,101 @@
+import os
+import threading
+import time
+from urllib.parse import quote, unquote
+from json_store import JsonStore
+
+try:
+    import fcntl
+except ImportError:  # Windows – bez blokady; przechwytywanie uruchamiamy wtedy tylko w jednym miejscu
+    fcntl = None
+
+VIEW_FLUSH_INTERVAL = 10
+
+
+class SharedState:
+    """Stan wymieniany przez katalog snapshotów między procesami WWW a procesem przechwytywania.
+
+    - status.json   – harmonogram, stan przeglądarek i statystyki zrzutów (zapisuje proces przechwytywania)
+    - views.json    – kiedy ostatnio ktoś pobrał obraz monitora (zapisują procesy WWW)
+    - streams.json  – monitory oglądane teraz przez /stream (zapisują procesy WWW)
+    - capture_requests/<tv_id> – zlecenia "zrób zrzut teraz" z panelu administracyjnego
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.status_store = JsonStore(os.path.join(directory, 'status.json'))
+        self.views_store = JsonStore(os.path.join(directory, 'views.json'))
+        self.streams_store = JsonStore(os.path.join(directory, 'streams.json'))
+        self.requests_dir = os.path.join(directory, 'capture_requests')
+        self.lock_file = None
+
+        self.views_lock = threading.Lock()
+        self.pending_views = {}
+        self.views_flushed_at = 0
+
+        os.makedirs(self.requests_dir, exist_ok=True)
+
+    def acquire_capture_lock(self):
+        # Proces przechwytywania może działać tylko jeden, niezależnie od liczby procesów WWW
+        if fcntl is None:
+            return True
+        lock_file = open(os.path.join(self.directory, '.capture.lock'), 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self.lock_file = lock_file
+        return True
+
+    def request_capture(self, tv_id):
+        with open(os.path.join(self.requests_dir, quote(tv_id, safe='')), 'a'):
+            pass
+
+    def take_capture_requests(self):
+        requests = []
+        for name in os.listdir(self.requests_dir):
+            try:
+                os.remove(os.path.join(self.requests_dir, name))
+            except FileNotFoundError:
+                continue
+            requests.append(unquote(name))
+        return requests
+
+    def record_view(self, tv_id):
+        now = time.time()
+        with self.views_lock:
+            self.pending_views[tv_id] = now
+            if now - self.views_flushed_at < VIEW_FLUSH_INTERVAL:
+                return
+            pending, self.pending_views = self.pending_views, {}
+            self.views_flushed_at = now
+
+        with self.views_store.edit() as views:
+            for viewed_id, viewed_at in pending.items():
+                views[viewed_id] = max(viewed_at, views.get(viewed_id, 0))
+
+    def last_view(self, tv_id):
+        with self.views_lock:
+            pending = self.pending_views.get(tv_id)
+        stored = self.views_store.read().get(tv_id)
+        return max(filter(None, (pending, stored)), default=None)
+
+    def record_stream(self, tv_id):
+        # Wywoływane okresowo przez każdy otwarty strumień monitora
+        now = time.time()
+        with self.streams_store.edit() as streams:
+            for stale_id in [stale_id for stale_id, seen_at in streams.items() if now - seen_at > 3600]:
+                del streams[stale_id]
+            streams[tv_id] = now
+
+    def active_streams(self, max_age):
+        now = time.time()
+        return {tv_id for tv_id, seen_at in self.streams_store.read().items() if now - seen_at < max_age}
+
+    def write_status(self, status):
+        status['updated_at'] = time.time()
+        self.status_store.write(status)
+
+    def read_status(self):
+        return self.status_store.read()
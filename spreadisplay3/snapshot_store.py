@@ -0,0 +1,228 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows – zostaje tylko blokada między wątkami
+    fcntl = None
+
+INDEX_FILE = 'index.json'
+
+
+class SnapshotStore:
+    """Wersjonowane zrzuty monitorów.
+
+    Każda klatka trafia najpierw do pliku tymczasowego, a potem jest atomowo
+    przenoszona (os.replace) pod nazwę `<tv_id>.<wersja>.<rozszerzenie>`. Indeks
+    tv_id -> bieżąca wersja jest trzymany w pamięci i zapisywany do index.json,
+    więc czytelnik zawsze dostaje kompletny plik, a zapis nigdy nie czeka na odczyt.
+    Indeks zmieniają dwa rodzaje procesów (przechwytywanie i workery WWW), więc
+    każdy odczyt-modyfikacja-zapis indeksu odbywa się pod blokadą index.json.lock.
+    """
+
+    def __init__(self, directory, formats, keep_versions=2):
+        self.directory = os.path.abspath(directory)
+        self.formats = formats
+        self.keep_versions = keep_versions
+        self.lock = threading.RLock()
+        self.index = {}
+        self.index_stat = None
+        self.index_path = os.path.join(directory, INDEX_FILE)
+
+        os.makedirs(directory, exist_ok=True)
+        with self.lock:
+            self._remove_temp_files()
+            if os.path.exists(self.index_path):
+                self._load_index()
+            else:
+                self._import_legacy_files()
+
+    def current(self, tv_id, fmt='png'):
+        with self.lock:
+            self._reload_if_changed()
+            entry = self.index.get(tv_id)
+            if entry is None or fmt not in entry['files']:
+                return None
+            info = dict(entry['files'][fmt])
+            info['version'] = entry['version']
+            info['path'] = os.path.join(self.directory, info['name'])
+            return info
+
+    def versions(self):
+        with self.lock:
+            self._reload_if_changed()
+            return {tv_id: entry['version'] for tv_id, entry in self.index.items()}
+
+    def publish(self, tv_id, data):
+        with self._exclusive():
+            self._reload_if_changed()
+            entry = self.index.get(tv_id)
+            version = entry['version'] + 1 if entry else 1
+            old_files = list(entry['files'].values()) if entry else []
+
+            self.index[tv_id] = {
+                'version': version,
+                'published_at': time.time(),
+                'files': {'png': self._write(tv_id, version, 'png', data)},
+            }
+            self._retire(tv_id, old_files, version)
+            self._save_index()
+            return version
+
+    def publish_variant(self, tv_id, version, fmt, data):
+        # Wariant zakodowany ze starszej klatki jest odrzucany
+        with self._exclusive():
+            self._reload_if_changed()
+            entry = self.index.get(tv_id)
+            if entry is None or entry['version'] != version:
+                return False
+            entry['files'][fmt] = self._write(tv_id, version, fmt, data)
+            self._save_index()
+            return True
+
+    def rename(self, old_id, new_id):
+        with self._exclusive():
+            self._reload_if_changed()
+            entry = self.index.pop(old_id, None)
+            if entry is None:
+                return
+            for fmt, info in entry['files'].items():
+                name = self._file_name(new_id, entry['version'], fmt)
+                os.replace(os.path.join(self.directory, info['name']), os.path.join(self.directory, name))
+                info['name'] = name
+            self.index[new_id] = entry
+            self._remove_stale(old_id, keep=set())
+            self._save_index()
+
+    def delete(self, tv_id):
+        with self._exclusive():
+            self._reload_if_changed()
+            entry = self.index.pop(tv_id, None)
+            if entry is not None:
+                for info in entry['files'].values():
+                    self._remove(info['name'])
+            self._remove_stale(tv_id, keep=set())
+            self._save_index()
+
+    @contextmanager
+    def _exclusive(self):
+        with self.lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.index_path + '.lock', 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _file_name(self, tv_id, version, fmt):
+        return f"{tv_id}.{version}.{self.formats[fmt][1]}"
+
+    def _write(self, tv_id, version, fmt, data):
+        name = self._file_name(tv_id, version, fmt)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=f'.{tv_id}.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, os.path.join(self.directory, name))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        return {
+            'name': name,
+            'etag': hashlib.sha256(data).hexdigest(),
+            'mtime': time.time(),
+            'size': len(data),
+        }
+
+    def _retire(self, tv_id, old_files, version):
+        # Poprzednie wersje zostają chwilę na dysku dla czytelników, którzy już je otworzyli
+        keep = {self._file_name(tv_id, v, fmt)
+                for v in range(max(1, version - self.keep_versions), version + 1)
+                for fmt in self.formats}
+        for info in old_files:
+            if info['name'] not in keep:
+                self._remove(info['name'])
+        self._remove_stale(tv_id, keep)
+
+    def _remove_stale(self, tv_id, keep):
+        prefix = f"{tv_id}."
+        for name in os.listdir(self.directory):
+            if not name.startswith(prefix) or name in keep:
+                continue
+            version = name[len(prefix):].split('.', 1)[0]
+            if version.isdigit():
+                self._remove(name)
+
+    def _remove(self, name):
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            pass
+
+    def _remove_temp_files(self):
+        # Pozostałości po przerwanym zapisie; świeże pliki może właśnie zapisywać inny proces
+        for name in os.listdir(self.directory):
+            if name.startswith('.') and name.endswith('.tmp'):
+                try:
+                    if time.time() - os.path.getmtime(os.path.join(self.directory, name)) > 60:
+                        self._remove(name)
+                except FileNotFoundError:
+                    pass
+
+    def _import_legacy_files(self):
+        # Zrzuty zapisane przed wersjonowaniem (<tv_id>.png) traktujemy jako wersję 0
+        for name in os.listdir(self.directory):
+            tv_id, ext = os.path.splitext(name)
+            if ext != '.png' or '.' in tv_id:
+                continue
+            path = os.path.join(self.directory, name)
+            with open(path, 'rb') as f:
+                data = f.read()
+            self.index[tv_id] = {
+                'version': 0,
+                'published_at': os.path.getmtime(path),
+                'files': {'png': {
+                    'name': name,
+                    'etag': hashlib.sha256(data).hexdigest(),
+                    'mtime': os.path.getmtime(path),
+                    'size': len(data),
+                }},
+            }
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, 'r') as f:
+                self.index = json.load(f)
+            self.index_stat = self._stat_index()
+        except (OSError, ValueError) as e:
+            print(f"❌ Nie udało się wczytać indeksu snapshotów: {e}")
+
+    def _reload_if_changed(self):
+        # Inny proces (np. osobny proces przechwytywania) mógł opublikować nowe wersje
+        stat = self._stat_index()
+        if stat is not None and stat != self.index_stat:
+            self._load_index()
+
+    def _stat_index(self):
+        try:
+            stat = os.stat(self.index_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _save_index(self):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.index.', suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.index, f)
+        os.replace(tmp_path, self.index_path)
+        self.index_stat = self._stat_index()
@@ -408,6 +408,25 @@ async function confirmRename() {
     }
 }
 
+// Capture monitor snapshot immediately
+async function captureNow(monitorName) {
+    try {
+        const response = await fetch('/capture_now', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ name: monitorName })
+        });
+        
+        const data = await response.json();
+        showToast(data.message, data.success ? 'success' : 'error');
+    } catch (error) {
+        showToast('Błąd podczas zlecania zrzutu', 'error');
+        console.error('Capture now error:', error);
+    }
+}
+
 // Delete monitor
 function deleteMonitor(monitorName) {
     currentMonitorToDelete = monitorName;
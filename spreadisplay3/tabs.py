@@ -0,0 +1,83 @@
+import base64
+import threading
+import time
+import weakref
+
+# Karty otwarte w każdej przeglądarce; przeglądarka po wymianie zaczyna bez kart
+_tab_sets = weakref.WeakKeyDictionary()
+_tab_sets_lock = threading.Lock()
+
+
+class TabSet:
+    """Stałe karty jednej przeglądarki, po jednej na klucz renderu.
+
+    Pierwsze okno przeglądarki ("home") zostaje dla zwykłych zrzutów z nawigacją,
+    więc tryb kart nigdy go nie przejmuje ani nie zamyka.
+    """
+
+    def __init__(self, driver):
+        # Słaba referencja – inaczej wpis w _tab_sets trzymałby przeglądarkę (i siebie) na zawsze
+        self._driver = weakref.ref(driver)
+        self.home = driver.current_window_handle
+        self.tabs = {}
+
+    @property
+    def driver(self):
+        driver = self._driver()
+        if driver is None:
+            raise RuntimeError("przeglądarka tych kart została już zamknięta")
+        return driver
+
+    def get(self, key):
+        return self.tabs.get(key)
+
+    def open(self, key, url):
+        self.driver.switch_to.new_window('tab')
+        tab = {'handle': self.driver.current_window_handle, 'url': url, 'loaded_at': None, 'used_at': time.time()}
+        self.tabs[key] = tab
+        return tab
+
+    def switch(self, tab):
+        self.driver.switch_to.window(tab['handle'])
+        tab['used_at'] = time.time()
+
+    def switch_home(self):
+        if self.driver.current_window_handle != self.home:
+            self.driver.switch_to.window(self.home)
+
+    def close(self, key):
+        tab = self.tabs.pop(key, None)
+        if tab is None:
+            return
+        try:
+            self.driver.switch_to.window(tab['handle'])
+            self.driver.close()
+        except Exception:
+            pass
+        self.driver.switch_to.window(self.home)
+
+    def close_idle(self, idle_after):
+        # Karty monitorów usuniętych, przeniesionych albo ze zmienionym URL-em
+        now = time.time()
+        for key, tab in list(self.tabs.items()):
+            if now - tab['used_at'] > idle_after:
+                self.close(key)
+
+
+def tab_set(driver):
+    with _tab_sets_lock:
+        tabs = _tab_sets.get(driver)
+        if tabs is None:
+            tabs = _tab_sets[driver] = TabSet(driver)
+        return tabs
+
+
+def has_tabs(driver):
+    with _tab_sets_lock:
+        return driver in _tab_sets
+
+
+def capture_screenshot(driver):
+    # Zrzut bieżącej karty bezpośrednio przez CDP
+    result = driver.execute_cdp_cmd('Page.captureScreenshot', {'format': 'png', 'captureBeyondViewport': False})
+    return base64.b64decode(result['data'])
@@ -0,0 +1,133 @@
+import hashlib
+import io
+import math
+import threading
+from collections import OrderedDict
+from PIL import Image, ImageDraw
+
+BACKGROUND = (17, 17, 17)
+LABEL_COLOR = (255, 255, 255)
+# Tyle różnych układów (zestaw monitorów + rozmiar) trzymamy w pamięci, o ile razem mieszczą się w CACHE_BYTES
+CACHED_LAYOUTS = 8
+CACHE_BYTES = 64 * 2**20
+
+
+class Wall:
+    """Jeden układ ściany: płótno z kafelkami i wersje snapshotów, z których je narysowano."""
+
+    def __init__(self, tv_ids, width, height, columns):
+        self.tv_ids = tv_ids
+        self.columns = columns
+        self.rows = math.ceil(len(tv_ids) / columns)
+        self.tile_width = max(1, width // columns)
+        self.tile_height = max(1, height // self.rows)
+        self.canvas = Image.new('RGB', (width, height), BACKGROUND)
+        self.versions = {}
+        self.encoded = {}
+
+    def tile_box(self, index):
+        x = (index % self.columns) * self.tile_width
+        y = (index // self.columns) * self.tile_height
+        return x, y, x + self.tile_width, y + self.tile_height
+
+    def size(self):
+        return self.canvas.width * self.canvas.height * 3 + sum(len(data) for data, _ in self.encoded.values())
+
+
+class WallComposer:
+    """Składa bieżące snapshoty wielu monitorów w jeden obraz.
+
+    Gotowe płótno jest trzymane w pamięci; przy kolejnym żądaniu przerysowywane są
+    tylko kafelki monitorów, których wersja snapshotu się zmieniła, a obraz jest
+    kodowany ponownie tylko wtedy, gdy zmienił się choć jeden kafelek.
+    """
+
+    def __init__(self, snapshot_store, thumb_width=480, jpeg_quality=85, webp_quality=80, cache_bytes=CACHE_BYTES):
+        self.snapshot_store = snapshot_store
+        self.cache_bytes = cache_bytes
+        self.thumb_width = thumb_width
+        self.jpeg_quality = jpeg_quality
+        self.webp_quality = webp_quality
+        self.lock = threading.Lock()
+        self.walls = OrderedDict()
+
+    def render(self, tv_ids, width, height, columns=None, fmt='jpeg'):
+        """Zwraca (dane obrazu, etag) ściany z monitorów tv_ids."""
+        tv_ids = list(dict.fromkeys(tv_ids))
+        columns = columns or math.ceil(math.sqrt(len(tv_ids)))
+        # Kafelek musi mieć co najmniej 1 px szerokości i wysokości
+        columns = max(1, min(columns, len(tv_ids), width), math.ceil(len(tv_ids) / height))
+        key = (tuple(tv_ids), width, height, columns)
+
+        with self.lock:
+            wall = self.walls.get(key)
+            if wall is None:
+                wall = Wall(tv_ids, width, height, columns)
+                self.walls[key] = wall
+            self.walls.move_to_end(key)
+
+            versions = self.snapshot_store.versions()
+            changed = False
+            for index, tv_id in enumerate(tv_ids):
+                version = versions.get(tv_id)
+                if tv_id in wall.versions and wall.versions[tv_id] == version:
+                    continue
+                # Plik mógł zniknąć między odczytem indeksu a otwarciem – wtedy próbujemy przy następnym żądaniu
+                if self._draw_tile(wall, index, tv_id) or version is None:
+                    wall.versions[tv_id] = version
+                changed = True
+
+            if changed:
+                wall.encoded = {}
+            if fmt not in wall.encoded:
+                data = self._encode(wall.canvas, fmt)
+                wall.encoded[fmt] = (data, hashlib.sha256(data).hexdigest())
+            self._evict()
+            return wall.encoded[fmt]
+
+    def _evict(self):
+        # Najdawniej używane układy wypadają, gdy jest ich za dużo albo zajmują za dużo pamięci; bieżący zostaje zawsze
+        total = sum(wall.size() for wall in self.walls.values())
+        while len(self.walls) > 1 and (len(self.walls) > CACHED_LAYOUTS or total > self.cache_bytes):
+            _, wall = self.walls.popitem(last=False)
+            total -= wall.size()
+
+    def _draw_tile(self, wall, index, tv_id):
+        box = wall.tile_box(index)
+        wall.canvas.paste(BACKGROUND, box)
+
+        image = self._load(tv_id, wall.tile_width)
+        if image is not None:
+            image.thumbnail((wall.tile_width, wall.tile_height), Image.BILINEAR)
+            x = box[0] + (wall.tile_width - image.width) // 2
+            y = box[1] + (wall.tile_height - image.height) // 2
+            wall.canvas.paste(image, (x, y))
+
+        draw = ImageDraw.Draw(wall.canvas)
+        draw.rectangle((box[0], box[3] - 16, box[0] + 8 + 7 * len(tv_id), box[3]), fill=BACKGROUND)
+        draw.text((box[0] + 4, box[3] - 14), tv_id, fill=LABEL_COLOR)
+        return image is not None
+
+    def _load(self, tv_id, tile_width):
+        # Miniatura wystarcza dla małych kafelków i dekoduje się dużo szybciej niż pełny PNG
+        formats = ['thumb', 'png'] if tile_width <= self.thumb_width else ['png']
+        for fmt in formats:
+            info = self.snapshot_store.current(tv_id, fmt)
+            if info is None:
+                continue
+            try:
+                with Image.open(info['path']) as image:
+                    return image.convert('RGB')
+            except OSError:
+                continue
+        return None
+
+    def _encode(self, canvas, fmt):
+        buffer = io.BytesIO()
+        if fmt == 'webp':
+            canvas.save(buffer, 'WEBP', quality=self.webp_quality, method=4)
+        elif fmt == 'png':
+            canvas.save(buffer, 'PNG')
+        else:
+            canvas.save(buffer, 'JPEG', quality=self.jpeg_quality)
+        return buffer.getvalue()
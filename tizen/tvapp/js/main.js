@@ -1,5 +1,6 @@
 var SERVER_IP = '10.101.133.225';  // IP twojego backendu Flask
 var API_URL = 'http://' + SERVER_IP + ':5000/api/links';
+var EVENTS_URL = 'http://' + SERVER_IP + ':5000/api/events';
 
 var linksContainer = document.getElementById('links');
 var iframe = document.getElementById('viewer');
@@ -7,6 +8,13 @@ var iframe = document.getElementById('viewer');
 var currentTvId = null;
 var tvIds = [];
 let refreshCounter = 0;
+let eventsConnected = false;
+let snapshotVersions = {};
+let eventSource = null;
+// Monitor, dla którego otwarty jest strumień zdarzeń (serwer liczy go jako oglądany)
+let subscribedTvId = null;
+// Wersja klatki wyświetlanej teraz w iframe (undefined – wczytana bez numeru wersji)
+let shownVersion;
 
 function arraysEqual(a, b) {
   return a.length === b.length && a.every((val, i) => val === b[i]);
@@ -105,8 +113,95 @@ function loadTv(tvId) {
   Array.from(linksContainer.children).forEach(btn => {
     btn.classList.toggle('active', btn.textContent === tvId);
   });
-  iframe.src = 'http://' + SERVER_IP + ':5000/proxy/' + tvId;
+  shownVersion = snapshotVersions[tvId];
+  iframe.src = proxyUrl(tvId);
   console.log('Ładowanie: ' + tvId);
+  if (tvId !== subscribedTvId) {
+    subscribeEvents();
+  }
+}
+
+function proxyUrl(tvId) {
+  // Numer wersji w URL omija cache przeglądarki, gdy serwer ogłosi nową klatkę
+  var url = 'http://' + SERVER_IP + ':5000/proxy/' + tvId;
+  if (snapshotVersions[tvId] !== undefined) {
+    url += '?v=' + snapshotVersions[tvId];
+  }
+  return url;
+}
+
+function reloadIframe() {
+  iframe.style.transition = 'opacity 1s ease';
+  iframe.style.opacity = '0';
+
+  setTimeout(function () {
+    const tempIframe = document.createElement('iframe');
+    tempIframe.style.display = 'none';
+    shownVersion = snapshotVersions[currentTvId];
+    tempIframe.src = proxyUrl(currentTvId);
+
+    tempIframe.onload = function () {
+      iframe.src = tempIframe.src;
+      setTimeout(function () {
+        iframe.style.opacity = '1';
+      }, 100);
+      console.log('🔄 Auto odświeżenie iframe: ' + currentTvId);
+      tempIframe.remove();
+    };
+
+    document.body.appendChild(tempIframe);
+  }, 500);
+}
+
+function subscribeEvents() {
+  if (typeof EventSource === 'undefined') {
+    return;
+  }
+
+  if (eventSource) {
+    eventSource.close();
+  }
+
+  // Serwer wysyła zdarzenia od razu po zmianie linków lub nowej klatce – polling zostaje tylko jako zapas.
+  // Z ?tv= serwer wie, który monitor jest oglądany, także gdy klatka długo się nie zmienia
+  var url = EVENTS_URL;
+  if (currentTvId) {
+    url += '?tv=' + encodeURIComponent(currentTvId);
+  }
+  subscribedTvId = currentTvId;
+  var source = new EventSource(url);
+  eventSource = source;
+
+  source.onopen = function () {
+    eventsConnected = true;
+    console.log('📡 Połączono ze strumieniem zdarzeń');
+  };
+
+  source.onerror = function () {
+    eventsConnected = false;
+  };
+
+  source.addEventListener('links', function () {
+    fetchLinks(false, false);
+  });
+
+  // Po (ponownym) połączeniu serwer podaje bieżące wersje klatek, bo starszych zdarzeń klient już nie dostanie
+  source.addEventListener('reset', function (e) {
+    var data = JSON.parse(e.data);
+    Object.assign(snapshotVersions, data.snapshots || {});
+    fetchLinks(true, false);
+    if (currentTvId && snapshotVersions[currentTvId] !== shownVersion) {
+      reloadIframe();
+    }
+  });
+
+  source.addEventListener('snapshot', function (e) {
+    var data = JSON.parse(e.data);
+    snapshotVersions[data.tv_id] = data.version;
+    if (data.tv_id === currentTvId && data.version !== shownVersion) {
+      reloadIframe();
+    }
+  });
 }
 
 window.onload = function () {
@@ -114,6 +209,7 @@ window.onload = function () {
   currentTvId = null;
   tvIds = [];
   fetchLinks(true);
+  subscribeEvents();
 };
 
 window.addEventListener('keydown', function (e) {
@@ -133,32 +229,17 @@ window.addEventListener('keydown', function (e) {
 const REFRESH_INTERVAL_MS = 30000;
 
 setInterval(function () {
-  if (currentTvId) {
-    iframe.style.transition = 'opacity 1s ease';
-    iframe.style.opacity = '0';
-
-    setTimeout(function () {
-      const tempIframe = document.createElement('iframe');
-      tempIframe.style.display = 'none';
-      tempIframe.src = 'http://' + SERVER_IP + ':5000/proxy/' + currentTvId;
-
-      tempIframe.onload = function () {
-        iframe.src = tempIframe.src;
-        setTimeout(function () {
-          iframe.style.opacity = '1';
-        }, 100);
-        console.log('🔄 Auto odświeżenie iframe: ' + currentTvId);
-        tempIframe.remove();
-      };
-
-      document.body.appendChild(tempIframe);
-    }, 500);
+  if (currentTvId && !eventsConnected) {
+    reloadIframe();
   }
 }, REFRESH_INTERVAL_MS);
 
 const LINKS_CHECK_INTERVAL_MS = 30000;
 
 setInterval(function () {
+  if (eventsConnected) {
+    return;
+  }
   refreshCounter++;
   const forceReloadIframe = refreshCounter % 3 === 0;
   fetchLinks(false, forceReloadIframe);
@@ -0,0 +1,153 @@
+import threading
+
+import pygetwindow as gw
+
+# Co ile sekund lista okien jest odczytywana w tle
+REFRESH_INTERVAL = 1.0
+
+
+class WindowInfo:
+    """Okno z wartościami odczytanymi raz przy odświeżeniu; każdy odczyt z samego okna to osobne wywołanie WinAPI."""
+
+    __slots__ = ("hwnd", "window", "title", "title_lower", "rect", "monitor")
+
+    def __init__(self, window, title, rect, monitor):
+        self.hwnd = window._hWnd
+        self.window = window
+        self.title = title
+        self.title_lower = title.lower()
+        self.rect = rect
+        self.monitor = monitor
+
+
+class WindowCache:
+    """Lista widocznych okien odświeżana w osobnym wątku.
+
+    Monitor (identyfikator z MonitorTopology) jest przypisywany jednym wywołaniem
+    MonitorLayout.assign() dla wszystkich okien, które się przesunęły albo pojawiły,
+    a po zmianie układu monitorów – dla wszystkich okien. Kolejność okien jest
+    stała (nowe na końcu), a wersja rośnie tylko wtedy, gdy zmieniło się coś,
+    co widać na liście.
+    """
+
+    def __init__(self, topology, interval=REFRESH_INTERVAL):
+        self.topology = topology
+        self.layout_version = None
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+        self.wake = threading.Event()
+        self.windows = {}
+        self.version = 0
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True, name="window-cache")
+        self.thread.start()
+
+    def snapshot(self):
+        with self.lock:
+            return self.version, self.windows
+
+    def refresh(self):
+        with self.refresh_lock:
+            previous = self.windows
+            layout = self.topology.layout
+            relocate = layout.version != self.layout_version
+            found = {}
+            unassigned = []
+            for window in gw.getAllWindows():
+                try:
+                    if not window.visible:
+                        continue
+                    title = window.title
+                    if not title.strip():
+                        continue
+                    rect = tuple(window.box)
+                except Exception:
+                    # Okno zamknięte w trakcie odczytu
+                    continue
+                old = previous.get(window._hWnd)
+                info = WindowInfo(window, title, rect, None)
+                if old is not None and old.rect == rect and not relocate:
+                    info.monitor = old.monitor
+                else:
+                    unassigned.append(info)
+                found[window._hWnd] = info
+
+            for info, monitor in zip(unassigned, layout.assign([info.rect for info in unassigned])):
+                info.monitor = monitor
+
+            windows = {hwnd: found[hwnd] for hwnd in previous if hwnd in found}
+            windows.update((hwnd, info) for hwnd, info in found.items() if hwnd not in windows)
+
+            changed = [(i.hwnd, i.title, i.monitor) for i in windows.values()] != \
+                [(i.hwnd, i.title, i.monitor) for i in previous.values()]
+            with self.lock:
+                self.windows = windows
+                self.layout_version = layout.version
+                if changed:
+                    self.version += 1
+            return changed
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Błąd odczytu listy okien: {e}")
+            self.wake.wait(self.interval)
+            self.wake.clear()
+
+
+class WindowFilter:
+    """Filtr po tytule; gdy zapytanie tylko się wydłuża, przeszukuje poprzedni wynik zamiast całej listy."""
+
+    def __init__(self):
+        self.version = None
+        self.query = None
+        self.matches = []
+
+    def apply(self, version, windows, query):
+        query = query.strip().lower()
+        if version == self.version and self.query is not None and query.startswith(self.query):
+            source = self.matches
+        else:
+            source = windows.values()
+        self.matches = [info for info in source if query in info.title_lower]
+        self.version = version
+        self.query = query
+        return self.matches
+
+
+class TreeSync:
+    """Aktualizuje Treeview różnicowo: usuwa, dodaje i zmienia tylko te wiersze, które tego wymagają."""
+
+    def __init__(self, tree):
+        self.tree = tree
+        self.order = []
+        self.values = {}
+
+    def update(self, rows):
+        """rows: lista (iid, wartości) w docelowej kolejności."""
+        wanted = dict(rows)
+        stale = [iid for iid in self.order if iid not in wanted]
+        if stale:
+            self.tree.delete(*stale)
+            for iid in stale:
+                del self.values[iid]
+
+        order = [iid for iid in self.order if iid in wanted]
+        for index, (iid, values) in enumerate(rows):
+            if iid not in self.values:
+                self.tree.insert("", index, iid=iid, values=values)
+                order.insert(index, iid)
+            else:
+                if self.values[iid] != values:
+                    self.tree.item(iid, values=values)
+                if order[index] != iid:
+                    self.tree.move(iid, "", index)
+                    order.remove(iid)
+                    order.insert(index, iid)
+            self.values[iid] = values
+        self.order = order
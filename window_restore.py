@@ -0,0 +1,248 @@
+import ctypes
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import pygetwindow as gw
+
+# Co ile sekund sprawdzamy, czy pojawiły się nowe okna
+POLL_INTERVAL = 0.1
+# Po tylu sekundach przestajemy czekać na okna, które się nie pojawiły
+WINDOW_TIMEOUT = 15
+# O tyle pikseli okno może odstawać od monitora (niewidoczne ramki Windows 10), a i tak uznajemy je za ustawione
+PLACEMENT_TOLERANCE = 16
+
+LAUNCH_MODES = {
+    "app": "Aplikacja (bez paska adresu)",
+    "kiosk": "Kiosk (pełny ekran)",
+    "window": "Zwykłe okno",
+}
+# Tryb proponowany w oknie dodawania linku
+DEFAULT_LAUNCH_MODE = "app"
+# Linki zapisane przed wprowadzeniem trybów (bez klucza "mode") otwierały się jako zwykłe okno
+LEGACY_LAUNCH_MODE = "window"
+# Tylko zwykłe okno przeglądarki ma w tytule nazwę Chrome; okna --app i --kiosk mają sam tytuł strony
+BROWSER_TITLE_MARKERS = (" - Google Chrome", " - Chromium")
+CHROME_WINDOW_CLASS = "Chrome_WidgetWin_"
+
+
+def window_handles():
+    return {w._hWnd: w for w in gw.getAllWindows()}
+
+
+def window_process(window):
+    """PID procesu, do którego należy okno (None poza Windows)."""
+    if sys.platform != "win32":
+        return None
+    pid = ctypes.c_ulong()
+    ctypes.windll.user32.GetWindowThreadProcessId(window._hWnd, ctypes.byref(pid))
+    return pid.value
+
+
+def window_class(window):
+    if sys.platform != "win32":
+        return None
+    buffer = ctypes.create_unicode_buffer(256)
+    ctypes.windll.user32.GetClassNameW(window._hWnd, buffer, len(buffer))
+    return buffer.value
+
+
+def window_tag(index, url):
+    # Tytuł nadawany oknu przez --window-name; po nim rozpoznajemy, które okno należy do którego linku
+    return f"DisplayManager #{index + 1}: {url}"
+
+
+class RestoreJob:
+    def __init__(self, index, url, monitor, mode=LEGACY_LAUNCH_MODE):
+        self.index = index
+        self.url = url
+        self.monitor = monitor
+        self.mode = mode if mode in LAUNCH_MODES else LEGACY_LAUNCH_MODE
+        self.tag = window_tag(index, url)
+        self.process = None
+        self.window = None
+        self.error = None
+        self.placed = False
+        self.moved = False
+
+
+def chrome_args(chrome_path, job, profile_dir=None):
+    # Położenie i rozmiar okna Chrome dostaje już przy starcie, więc okno pojawia się od razu na swoim monitorze
+    monitor = job.monitor
+    args = [
+        chrome_path,
+        f"--window-position={monitor.x},{monitor.y}",
+        f"--window-size={monitor.width},{monitor.height}",
+        f"--window-name={job.tag}",
+    ]
+    if profile_dir:
+        args.append(f"--user-data-dir={profile_dir}")
+    if job.mode == "kiosk":
+        args += ["--kiosk", job.url]
+    elif job.mode == "app":
+        args.append(f"--app={job.url}")
+    else:
+        args += ["--new-window", job.url]
+    return args
+
+
+def launch(chrome_path, job, profile_dir=None):
+    job.process = subprocess.Popen(chrome_args(chrome_path, job, profile_dir))
+
+
+def window_in_place(window, monitor, tolerance=PLACEMENT_TOLERANCE):
+    return (
+        abs(window.left - monitor.x) <= tolerance
+        and abs(window.top - monitor.y) <= tolerance
+        and abs(window.width - monitor.width) <= 2 * tolerance
+        and abs(window.height - monitor.height) <= 2 * tolerance
+    )
+
+
+def set_window_rect(window, monitor):
+    """Ustawia położenie i rozmiar okna jednym wywołaniem, bez osobnego moveTo i resizeTo."""
+    if window.isMinimized or window.isMaximized:
+        window.restore()
+    if sys.platform != "win32":
+        window.moveTo(monitor.x, monitor.y)
+        window.resizeTo(monitor.width, monitor.height)
+        return
+
+    move = ctypes.windll.user32.MoveWindow
+    move(window._hWnd, monitor.x, monitor.y, monitor.width, monitor.height, True)
+    # Przejście na monitor z innym skalowaniem (DPI) zmienia rozmiar okna po przesunięciu – wtedy poprawiamy raz jeszcze
+    if not window_in_place(window, monitor, tolerance=0):
+        move(window._hWnd, monitor.x, monitor.y, monitor.width, monitor.height, True)
+
+
+def place_window(window, monitor):
+    set_window_rect(window, monitor)
+    window.activate()
+
+
+def match_windows(jobs, new_windows):
+    """Przypisuje nowe okna do linków po tytule z --window-name; zwraca okna, których nie dopasowano."""
+    waiting = [job for job in jobs if job.window is None]
+    unmatched = []
+    for window in new_windows:
+        job = next((job for job in waiting if job.tag in window.title), None)
+        if job is None:
+            unmatched.append(window)
+            continue
+        job.window = window
+        waiting.remove(job)
+    return unmatched
+
+
+def fits_mode(job, window):
+    """Czy okno mogło powstać z uruchomienia tego linku – sprawdzamy klasę okna i tytuł pasujący do trybu."""
+    window_cls = window_class(window)
+    if window_cls is not None and not window_cls.startswith(CHROME_WINDOW_CLASS):
+        return False
+    browser = any(marker in window.title for marker in BROWSER_TITLE_MARKERS)
+    return browser if job.mode == "window" else not browser
+
+
+def match_orphans(jobs, orphans):
+    """Przypisuje okna bez naszego tytułu (gdy Chrome zignoruje --window-name).
+
+    Okno trafia tylko do linku, którego tryb może dać taki tytuł: najpierw po PID
+    uruchomionego procesu, potem po adresie w tytule (okno --app przed wczytaniem
+    strony), a na końcu w kolejności uruchomienia.
+    """
+    waiting = [job for job in jobs if job.window is None]
+    pids = {window._hWnd: window_process(window) for window in orphans}
+
+    def same_process(job, window):
+        return job.process is not None and pids[window._hWnd] == job.process.pid
+
+    def same_url(job, window):
+        host = urlsplit(job.url).netloc.lower()
+        return bool(host) and host in window.title.lower()
+
+    for matches in (same_process, same_url, lambda job, window: True):
+        for window in list(orphans):
+            job = next((job for job in waiting if fits_mode(job, window) and matches(job, window)), None)
+            if job is None:
+                continue
+            job.window = window
+            waiting.remove(job)
+            orphans.remove(window)
+
+
+class RestoreEngine:
+    """Przywraca zapisane linki równolegle.
+
+    Wszystkie okna Chrome są uruchamiane naraz, od razu z położeniem i rozmiarem
+    monitora, a nowe okna wykrywane przez porównanie zbioru uchwytów okien z tym
+    sprzed uruchomienia. Okno, które mimo to nie trafiło na swój monitor (np. gdy
+    Chrome przekazał polecenie do już działającej przeglądarki), jest ustawiane
+    w osobnym wątku od razu po wykryciu.
+    """
+
+    def __init__(self, chrome_path, profile_dir=None, place=place_window, timeout=WINDOW_TIMEOUT,
+                 poll_interval=POLL_INTERVAL, workers=8):
+        self.chrome_path = chrome_path
+        self.profile_dir = profile_dir
+        self.place = place
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.workers = workers
+
+    def restore(self, jobs, on_progress=None, cancelled=None):
+        if not jobs:
+            return jobs
+
+        known = set(window_handles())
+        for job in jobs:
+            try:
+                launch(self.chrome_path, job, self.profile_dir)
+            except Exception as e:
+                job.error = f"Nie udało się uruchomić Chrome: {e}"
+
+        pending = [job for job in jobs if job.error is None]
+        lock = threading.Lock()
+        if on_progress:
+            for job in jobs:
+                if job.error is not None:
+                    on_progress(job)
+
+        def place(job):
+            try:
+                if not window_in_place(job.window, job.monitor):
+                    self.place(job.window, job.monitor)
+                    job.moved = True
+                job.placed = True
+            except Exception as e:
+                job.error = f"Nie udało się ustawić okna: {e}"
+            if on_progress:
+                with lock:
+                    on_progress(job)
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="restore") as executor:
+            deadline = time.monotonic() + self.timeout
+            while pending and time.monotonic() < deadline and not (cancelled and cancelled.is_set()):
+                time.sleep(self.poll_interval)
+                current = window_handles()
+                # Okno bez tytułu mogło jeszcze nie dostać nazwy – zostaje nowe do następnego odczytu
+                new_windows = [w for h, w in current.items() if h not in known and w.title.strip()]
+                known.update(w._hWnd for w in new_windows)
+
+                match_orphans(pending, match_windows(pending, new_windows))
+                for job in list(pending):
+                    if job.window is not None:
+                        pending.remove(job)
+                        executor.submit(place, job)
+
+            for job in pending:
+                if cancelled and cancelled.is_set():
+                    job.error = "Anulowano"
+                else:
+                    job.error = "Okno nie pojawiło się w wyznaczonym czasie"
+                if on_progress:
+                    with lock:
+                        on_progress(job)
+        return jobs
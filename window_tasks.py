@@ -0,0 +1,99 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Co tyle milisekund pętla Tk odbiera postęp i wyniki zadań
+PUMP_MS = 50
+
+
+class WindowTask:
+    """Operacja na oknach wykonywana w tle.
+
+    work(task) działa w wątku kolejki: po każdym kroku wywołuje task.advance(),
+    a między krokami sprawdza task.cancelled. on_progress(task) i on_done(task)
+    są wywoływane w wątku Tk.
+    """
+
+    def __init__(self, label, total, work, on_progress=None, on_done=None):
+        self.label = label
+        self.total = total
+        self.work = work
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.cancelled = threading.Event()
+        self.done = 0
+        self.message = ""
+        self.errors = []
+        self.result = None
+        self.finished = False
+        self.events = None
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def advance(self, message="", error=None):
+        self.done += 1
+        self.message = message
+        if error:
+            self.errors.append(error)
+        self.events.put(("progress", self))
+
+
+class WindowTaskQueue:
+    """Kolejka operacji na oknach: jeden wątek roboczy, więc operacje nie przeszkadzają sobie nawzajem.
+
+    Postęp i wyniki wracają do pętli Tk przez after() – widżetów dotyka tylko wątek Tk.
+    """
+
+    def __init__(self, root, on_change=None):
+        self.root = root
+        self.on_change = on_change
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="window-task")
+        self.events = queue.Queue()
+        self.tasks = []
+        self.pump_job = None
+
+    def submit(self, task):
+        task.events = self.events
+        self.tasks.append(task)
+        self.executor.submit(self._run, task)
+        self._notify(None, task)
+        if self.pump_job is None:
+            self.pump_job = self.root.after(PUMP_MS, self._pump)
+        return task
+
+    def active(self):
+        return [task for task in self.tasks if not task.finished]
+
+    def cancel_all(self):
+        for task in self.active():
+            task.cancel()
+
+    def _run(self, task):
+        try:
+            if not task.cancelled.is_set():
+                task.result = task.work(task)
+        except Exception as e:
+            task.errors.append(str(e))
+        self.events.put(("done", task))
+
+    def _notify(self, callback, task):
+        if callback:
+            callback(task)
+        if self.on_change:
+            self.on_change(task)
+
+    def _pump(self):
+        while True:
+            try:
+                kind, task = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "done":
+                task.finished = True
+                self.tasks.remove(task)
+                self._notify(task.on_done, task)
+            else:
+                self._notify(task.on_progress, task)
+
+        self.pump_job = self.root.after(PUMP_MS, self._pump) if self.tasks else None